@@ -1,7 +1,6 @@
 # agents/agent_manager.py
 from langchain.agents import Tool
 from langchain.agents import AgentExecutor
-from transformers import pipeline
 from langchain_community.llms import HuggingFacePipeline
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
@@ -12,36 +11,121 @@ from .developer import DeveloperAgent
 from .tester import TesterAgent
 from .project_manager import ProjectManagerAgent
 from database.db_manager import DatabaseManager
+from llm.backends import AGENT_ROLES, backend_spec_for, create_backend
 
 
 
 class AgentManager:
-    def __init__(self):
+    def __init__(self, db_manager=None, backends=None):
+        """
+        Build the agent set
+
+        Args:
+            db_manager (DatabaseManager): Shared artifact store (a new one is opened if omitted)
+            backends (dict): Optional role -> backend (or spec string such as
+                "ollama:codellama:7b") overrides. Roles are business_analyst, developer,
+                tester and project_manager; unset roles use <ROLE>_BACKEND, LLM_BACKEND
+                or the local transformers model.
+        """
         self.llm_model="facebook/opt-125m"
-        self.llm = pipeline("text-generation", model=self.llm_model)
-        self.db_manager = DatabaseManager()
+        self.backends = self._create_backends(backends or {})
+        # What each role was configured with, so a UI can offer to return to it
+        # (None for objects that cannot be described as a spec string)
+        self.configured_backend_specs = {
+            role: backend.describe() if callable(getattr(backend, "describe", None)) else None
+            for role, backend in self.backends.items()
+        }
+        # Kept for the CrewAI setup
+        self.llm = self.backends["business_analyst"]
+        # Reuse the caller's Chroma client instead of opening a second one
+        self.db_manager = db_manager if db_manager is not None else DatabaseManager()
         
         # Initialize agents
-        self.ba_agent = BusinessAnalystAgent(self.llm, self.db_manager)
-        self.dev_agent = DeveloperAgent(self.llm, self.db_manager)
-        self.test_agent = TesterAgent(self.llm, self.db_manager)
-        self.pm_agent = ProjectManagerAgent(self.llm_model, self.db_manager)
+        self.ba_agent = BusinessAnalystAgent(self.backends["business_analyst"], self.db_manager)
+        self.dev_agent = DeveloperAgent(self.backends["developer"], self.db_manager)
+        self.test_agent = TesterAgent(self.backends["tester"], self.db_manager)
+        self.pm_agent = ProjectManagerAgent(self.backends["project_manager"], self.db_manager)
+    
+    def _create_backends(self, overrides):
+        """Resolve one backend per role, sharing instances between identical specs"""
+        created = {}
+        backends = {}
+        for role in AGENT_ROLES:
+            spec = overrides.get(role) or backend_spec_for(role, default=f"hf:{self.llm_model}")
+            if not isinstance(spec, str):
+                backends[role] = spec
+                continue
+            if spec not in created:
+                created[spec] = create_backend(spec)
+            backends[role] = created[spec]
+        return backends
+    
+    def set_db_manager(self, db_manager):
+        """
+        Point every agent at another artifact store view (e.g. a new run)
+
+        Args:
+            db_manager (DatabaseManager): Store, usually scoped with DatabaseManager.scoped()
+        """
+        self.db_manager = db_manager
+        for agent in (self.ba_agent, self.dev_agent, self.test_agent, self.pm_agent):
+            agent.db_manager = db_manager
+    
+    def set_backend(self, role, backend):
+        """
+        Switch one agent to a different backend
+
+        Args:
+            role (str): business_analyst, developer, tester or project_manager
+            backend: An LLM backend or a spec string
+        """
+        if role not in AGENT_ROLES:
+            raise ValueError(f"Unknown agent role: {role}")
+        if isinstance(backend, str):
+            backend = create_backend(backend)
+        previous = self.backends.get(role)
+        self.backends[role] = backend
+        if role == "business_analyst":
+            self.ba_agent.llm = backend
+            self.llm = backend
+        elif role == "developer":
+            self.dev_agent.pipeline = backend
+        elif role == "tester":
+            self.test_agent.pipeline = backend
+        elif role == "project_manager":
+            self.pm_agent.set_backend(backend)
+        
+        # Backends are shared between roles; release the old one once no role uses it
+        if previous is not None and previous is not backend and \
+                not any(other is previous for other in self.backends.values()):
+            close = getattr(previous, "close", None)
+            if callable(close):
+                close()
         
-    def process_business_requirements(self, requirements):
+    def process_business_requirements(self, requirements, stream_callback=None, constrained=False):
         """Process initial business requirements and generate user stories"""
-        return self.ba_agent.generate_user_stories(requirements)
+        return self.ba_agent.generate_user_stories(
+            requirements,
+            stream_callback=stream_callback,
+            constrained=constrained
+        )
     
-    def develop_code(self, user_stories):
+    def develop_code(self, user_stories, stream_callback=None, per_story=False, batch_size=4):
         """Develop code based on user stories"""
-        return self.dev_agent.generate_code(user_stories)
+        return self.dev_agent.generate_code(
+            user_stories,
+            stream_callback=stream_callback,
+            per_story=per_story,
+            batch_size=batch_size
+        )
     
-    def create_test_cases(self, user_stories, code):
+    def create_test_cases(self, user_stories, code, stream_callback=None):
         """Create test cases based on user stories and code"""
-        return self.test_agent.generate_test_cases(user_stories, code)
+        return self.test_agent.generate_test_cases(user_stories, code, stream_callback=stream_callback)
     
-    def execute_tests(self, code, test_cases):
+    def execute_tests(self, code, test_cases, stream_callback=None):
         """Execute tests against the code"""
-        return self.test_agent.execute_tests(code, test_cases)
+        return self.test_agent.execute_tests(code, test_cases, stream_callback=stream_callback)
     
     def get_project_status(self, query):
         """Get project status based on PM query"""
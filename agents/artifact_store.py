@@ -0,0 +1,47 @@
+# agents/artifact_store.py
+"""
+Artifact persistence shared by the agents
+"""
+import os
+
+
+class ArtifactStoreMixin:
+    """Gives an agent with a db_manager attribute one way to persist what it generates"""
+
+    def _store_artifacts(self, batch, artifacts=(), max_retries=3):
+        """
+        Save generated artifacts to the artifact store (if available) in a single batched write
+        
+        Full bodies end up in the store's blob store, so artifacts that were stored
+        get the "blob_ref" of their stored row and no "path"; the others are written to their "path"
+        under artifacts/ instead. If the store raises, every artifact in the
+        batch counts as failed, so nothing generated is lost.
+        
+        Args:
+            batch (list): Dicts with "id", "content" and "metadata" for DatabaseManager.store_artifacts
+            artifacts (list): Dicts with "id", "content" and a fallback "path"; updated in place
+            max_retries (int): Attempts per write inside the store
+        """
+        failed = {}
+        if self.db_manager and batch:
+            try:
+                failed = self.db_manager.store_artifacts(batch, max_retries=max_retries)["failed"]
+            except Exception as e:
+                failed = {entry.get("id"): str(e) for entry in batch}
+            for artifact_id, error in failed.items():
+                print(f"⚠️ Failed to store {artifact_id} in ChromaDB: {error}")
+        # The stored row's blob_ref is the hash of the batch content, which can be
+        # serialized differently from the fallback file (later duplicates win, as in the store)
+        blob_refs = {}
+        if self.db_manager:
+            for entry in batch:
+                if entry.get("id") not in failed:
+                    blob_refs[entry["id"]] = self.db_manager.content_hash(entry["content"])
+        for artifact in artifacts:
+            if artifact["id"] in blob_refs:
+                artifact["blob_ref"] = blob_refs[artifact["id"]]
+                artifact["path"] = None
+            else:
+                os.makedirs(os.path.dirname(artifact["path"]), exist_ok=True)
+                with open(artifact["path"], "w") as f:
+                    f.write(artifact["content"])
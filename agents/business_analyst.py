@@ -1,18 +1,34 @@
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
 import json
-import os
 import re
-import time
 from typing import List, Dict, Any
 
-class BusinessAnalystAgent:
+from transformers import LogitsProcessorList
+
+from llm.json_constraint import UserStoryJsonLogitsProcessor
+from llm.stopping import build_stopping_criteria, report_early_stop
+from llm.streaming import generate_streaming
+
+from .artifact_store import ArtifactStoreMixin
+
+class BusinessAnalystAgent(ArtifactStoreMixin):
     def __init__(self, llm, db_manager):
         self.llm = llm
         self.db_manager = db_manager
+        self.last_stop_report = None
         
-    def generate_user_stories(self, business_requirements):
-        """Generate user stories from business requirements"""
+    def generate_user_stories(self, business_requirements, stream_callback=None, constrained=False):
+        """
+        Generate user stories from business requirements
+
+        Args:
+            business_requirements (str): Requirements to turn into user stories
+            stream_callback (callable): Optional stream_callback(text_chunk, stats), called
+                as tokens are generated
+            constrained (bool): Mask logits so the model can only emit JSON matching the
+                user-story schema, which makes a single generation always parse
+        """
         # Load user story template
         template_path = "database/templates/user_story.md"
         with open(template_path, "r") as f:
@@ -37,34 +53,63 @@ class BusinessAnalystAgent:
         Do not include any explanatory text before or after the JSON. The response should be parseable by json.loads().
         """
         
+        # Stop as soon as the JSON array is closed (or the model starts looping)
+        stopping_criteria = build_stopping_criteria(getattr(self.llm, "tokenizer", None), structure="json_array")
+        constraint_kwargs = {}
+        json_processor = None
+        if constrained and getattr(self.llm, "tokenizer", None) is not None:
+            json_processor = UserStoryJsonLogitsProcessor(self.llm.tokenizer)
+            constraint_kwargs["logits_processor"] = LogitsProcessorList([json_processor])
+        
         # Generate user stories using HuggingFace pipeline directly
-        try:
-            # Option 1: If pipeline accepts keyword arguments directly
-            generated_output = self.llm(
-                formatted_prompt, 
-                max_new_tokens=1024,         # Generate up to 1024 new tokens 
-                do_sample=True,              # Enable sampling for more diverse outputs
-                temperature=0.7,             # Control randomness
-                top_p=0.95                   # Nucleus sampling parameter
+        if stream_callback is not None:
+            generated_output = generate_streaming(
+                self.llm,
+                formatted_prompt,
+                stream_callback,
+                max_new_tokens=1024,
+                do_sample=True,
+                temperature=0.7,
+                top_p=0.95,
+                stopping_criteria=stopping_criteria,
+                **constraint_kwargs
             )
-        except TypeError as e:
-            # Option 2: If pipeline requires specific format
-            print(f"Adjusting generation parameters: {e}")
+        else:
             try:
-                # Some pipelines expect a dictionary of parameters
+                # Option 1: If pipeline accepts keyword arguments directly
                 generated_output = self.llm(
-                    formatted_prompt,
-                    generate_kwargs={
-                        'max_new_tokens': 1024,
-                        'do_sample': True,
-                        'temperature': 0.7,
-                        'top_p': 0.95
-                    }
+                    formatted_prompt, 
+                    max_new_tokens=1024,         # Generate up to 1024 new tokens 
+                    do_sample=True,              # Enable sampling for more diverse outputs
+                    temperature=0.7,             # Control randomness
+                    top_p=0.95,                  # Nucleus sampling parameter
+                    stopping_criteria=stopping_criteria,
+                    **constraint_kwargs
                 )
-            except Exception as e2:
-                print(f"Second attempt failed: {e2}")
-                # Option 3: Last resort - try with minimal parameters
-                generated_output = self.llm(formatted_prompt, max_length=None, max_new_tokens=1024)
+            except TypeError as e:
+                # Option 2: If pipeline requires specific format
+                print(f"Adjusting generation parameters: {e}")
+                try:
+                    # Some pipelines expect a dictionary of parameters
+                    generated_output = self.llm(
+                        formatted_prompt,
+                        generate_kwargs={
+                            'max_new_tokens': 1024,
+                            'do_sample': True,
+                            'temperature': 0.7,
+                            'top_p': 0.95,
+                            'stopping_criteria': stopping_criteria,
+                            **constraint_kwargs
+                        }
+                    )
+                except Exception as e2:
+                    print(f"Second attempt failed: {e2}")
+                    # Option 3: Last resort - try with minimal parameters
+                    generated_output = self.llm(formatted_prompt, max_length=None, max_new_tokens=1024)
+        
+        self.last_stop_report = report_early_stop(
+            stopping_criteria, max_new_tokens=1024, label="Business Analyst"
+        )
         
         # Extract the generated text (format depends on your pipeline configuration)
         if isinstance(generated_output, list):
@@ -76,20 +121,26 @@ class BusinessAnalystAgent:
         if formatted_prompt in result:
             result = result.replace(formatted_prompt, '')
         
-        # Try to extract JSON from the response using regex
-        json_pattern = r'\[[\s\S]*\]'  # Match anything that looks like a JSON array
-        json_match = re.search(json_pattern, result)
+        # Constrained output is valid by construction (closed off if the budget ran out)
+        constrained_text = json_processor.completed_text() if json_processor is not None else None
+        if constrained_text is not None:
+            user_stories = json.loads(constrained_text)
+            print("✅ Constrained decoding produced valid user story JSON")
+        else:
+            # Try to extract JSON from the response using regex
+            json_pattern = r'\[[\s\S]*\]'  # Match anything that looks like a JSON array
+            json_match = re.search(json_pattern, result)
         
-        if json_match:
-            potential_json = json_match.group(0)
-            try:
-                user_stories = json.loads(potential_json)
-                print("✅ Successfully parsed JSON from model output")
-            except json.JSONDecodeError:
-                print(f"⚠️ Found JSON-like structure but couldn't parse it: {potential_json[:100]}...")
+            if json_match:
+                potential_json = json_match.group(0)
+                try:
+                    user_stories = json.loads(potential_json)
+                    print("✅ Successfully parsed JSON from model output")
+                except json.JSONDecodeError:
+                    print(f"⚠️ Found JSON-like structure but couldn't parse it: {potential_json[:100]}...")
+                    user_stories = self._fallback_processing(result)
+            else:
                 user_stories = self._fallback_processing(result)
-        else:
-            user_stories = self._fallback_processing(result)
         
         # Save user stories with retry and local storage fallback
         self._save_user_stories(user_stories)
@@ -98,14 +149,9 @@ class BusinessAnalystAgent:
     
     def _save_user_stories(self, user_stories: List[Dict[str, Any]], max_retries: int = 3) -> None:
         """Save user stories to ChromaDB with retry mechanism and local fallback"""
-        # Always save to the file system first as backup
-        os.makedirs("artifacts/user_stories", exist_ok=True)
-        for idx, story in enumerate(user_stories):
-            story_id = f"user_story_{idx+1}"
-            with open(f"artifacts/user_stories/{story_id}.json", "w") as f:
-                json.dump(story, f, indent=2)
-            
-        # Then try to save to ChromaDB with retries
+        # Store every story in ChromaDB with one batched write; full bodies go to its blob store
+        batch = []
+        files = []
         for idx, story in enumerate(user_stories):
             story_id = f"user_story_{idx+1}"
             metadata = {
@@ -114,42 +160,20 @@ class BusinessAnalystAgent:
                 "priority": str(story.get("priority", "Medium"))
             }
             
-            # Truncate content if it's too large
+            # Long stories are embedded as several chunks by the database manager;
+            # the full story is stored either way
             content = json.dumps(story)
-            if len(content) > 5000:  # Arbitrary limit to avoid embedding timeout
-                print(f"⚠️ Story content too large ({len(content)} chars), truncating for embedding")
-                # Create a shorter version with essential info
-                short_story = {
-                    "title": story.get("title", "Untitled"),
-                    "priority": story.get("priority", "Medium"),
-                    "description_excerpt": story.get("description", "")[:500] + "..." if len(story.get("description", "")) > 500 else story.get("description", "")
-                }
-                content_for_embedding = json.dumps(short_story)
-            else:
-                content_for_embedding = content
-                
-            # Try to store in ChromaDB with retries
-            for attempt in range(max_retries):
-                try:
-                    print(f"Attempt {attempt+1}/{max_retries} to store {story_id} in ChromaDB")
-                    # Store with timeout handling
-                    self.db_manager.store_artifact(
-                        artifact_id=story_id,
-                        content=content_for_embedding,  # Use potentially truncated content for embedding
-                        metadata=metadata
-                    )
-                    print(f"✅ Successfully stored {story_id} in ChromaDB")
-                    break  # Success, exit retry loop
-                except Exception as e:
-                    print(f"⚠️ Error storing in ChromaDB (attempt {attempt+1}/{max_retries}): {str(e)}")
-                    if attempt < max_retries - 1:
-                        # Wait before retry with exponential backoff
-                        wait_time = 2 ** attempt  # 1, 2, 4, 8... seconds
-                        print(f"Waiting {wait_time} seconds before retry...")
-                        time.sleep(wait_time)
-                    else:
-                        print(f"❌ Failed to store {story_id} in ChromaDB after {max_retries} attempts")
-                        # Continue with other stories even if this one failed
+            
+            batch.append({"id": story_id, "content": content, "metadata": metadata})
+            files.append({
+                "id": story_id,
+                "path": f"artifacts/user_stories/{story_id}.json",
+                "content": json.dumps(story, indent=2)
+            })
+        
+        # Retries with exponential backoff happen inside the database manager; stories
+        # that could not be stored are kept on the file system instead
+        self._store_artifacts(batch, files, max_retries=max_retries)
     
     def _fallback_processing(self, result):
         """Fallback function to handle non-JSON output"""
@@ -129,17 +129,21 @@
 
 # agents/developer.py
 from transformers import pipeline
+from llm.backends import TransformersBackend
+from llm.stopping import build_stopping_criteria, report_early_stop
+from llm.streaming import generate_streaming
 import json
-import os
 import re
 
-class DeveloperAgent:
+from .artifact_store import ArtifactStoreMixin
+
+class DeveloperAgent(ArtifactStoreMixin):
     def __init__(self, model=None, db_manager=None):
         """
         Initialize the DeveloperAgent with a Hugging Face pipeline
         
         Args:
-            model: The model to use (can be a string model name or a pre-initialized model)
+            model: The model to use (a string model name, an LLM backend or a pre-initialized pipeline)
             db_manager: Database manager for storing artifacts
         """
         # Initialize the pipeline correctly
@@ -147,13 +151,14 @@ class DeveloperAgent:
             # Create a default text-generation pipeline if no model is provided
             self.pipeline = pipeline(task="text-generation")
         elif isinstance(model, str):
-            # If a string is provided, treat it as a model name
-            self.pipeline = pipeline(task="text-generation", model=model)
+            # If a string is provided, get the shared model from the registry
+            self.pipeline = TransformersBackend(model)
         else:
             # If an object is provided, use it directly as the model
             self.pipeline = model
             
         self.db_manager = db_manager
+        self.last_stop_report = None
     
     def _extract_code_blocks(self, text):
         """Extract code blocks from markdown text"""
@@ -166,8 +171,18 @@ class DeveloperAgent:
         
         return code_blocks
     
-    def generate_code(self, user_stories):
-        """Generate code based on user stories"""
+    def generate_code(self, user_stories, stream_callback=None, per_story=False, batch_size=4):
+        """
+        Generate code based on user stories
+
+        Args:
+            user_stories (list): User stories to implement
+            stream_callback (callable): Optional stream_callback(text_chunk, stats), called
+                as tokens are generated (single-prompt mode only)
+            per_story (bool): Build one prompt per user story and generate them as
+                padded batches instead of one prompt covering every story
+            batch_size (int): Number of story prompts per batch in per_story mode
+        """
         # Load code template
         template_path = "database/templates/code_template.py"
         with open(template_path, "r") as f:
@@ -179,6 +194,9 @@ class DeveloperAgent:
             except json.JSONDecodeError:
                 user_stories = [{"title": "Parsed from text", "description": user_stories}]
         
+        if per_story:
+            return self._generate_code_per_story(user_stories, template_content, batch_size)
+        
         # Create formatted prompt
         formatted_prompt = f"""
         You are an experienced Python Developer. Your task is to implement code based on the 
@@ -200,16 +218,25 @@ class DeveloperAgent:
         For each user story, create a separate function or class as appropriate.
         """
         
-        # Generate code using HF pipeline
+        # Generate code using HF pipeline, stopping once every story's block is closed
+        stopping_criteria = build_stopping_criteria(
+            getattr(self.pipeline, "tokenizer", None),
+            structure="fenced_blocks",
+            n_blocks=len(user_stories)
+        )
         generation_kwargs = {
             "max_length": 2048,
             "do_sample": True,
-            "temperature": 0.7
+            "temperature": 0.7,
+            "stopping_criteria": stopping_criteria
         }
         
         # Adjust based on pipeline type
-        if hasattr(self.pipeline, "generate"):
-            # For newer pipeline versions or language models
+        if stream_callback is not None:
+            # Stream tokens to the caller as they are generated
+            result = generate_streaming(self.pipeline, formatted_prompt, stream_callback, **generation_kwargs)
+        elif hasattr(self.pipeline, "generate") or hasattr(self.pipeline, "model"):
+            # For newer pipeline versions or language models (transformers pipelines expose .model)
             result = self.pipeline(formatted_prompt, **generation_kwargs)[0]['generated_text']
         else:
             # For text2text or chat models which might have different APIs
@@ -224,66 +251,150 @@ class DeveloperAgent:
             else:
                 result = str(result)  # Fallback
         
+        self.last_stop_report = report_early_stop(stopping_criteria, max_length=2048, label="Developer")
+        
         # Extract code blocks from the result
         code_blocks = self._extract_code_blocks(result)
         
         # Save the generated code
-        os.makedirs("artifacts/code", exist_ok=True)
-        
         code_artifacts = []
+        db_batch = []
         for idx, code_block in enumerate(code_blocks):
             code_id = f"code_artifact_{idx+1}"
             
             # Fix: Convert list of user story IDs to a comma-separated string for ChromaDB
             user_story_id_string = ",".join([f"user_story_{i+1}" for i in range(len(user_stories))])
             
-            # Save to ChromaDB if available
-            if self.db_manager:
-                self.db_manager.store_artifact(
-                    artifact_id=code_id,
-                    content=code_block,
-                    metadata={
-                        "type": "code",
-                        "language": "python",
-                        "user_story_ids": user_story_id_string  # Fixed: String instead of list
-                    }
-                )
-            
-            # Save to file system
-            file_path = f"artifacts/code/{code_id}.py"
-            with open(file_path, "w") as f:
-                f.write(code_block)
+            db_batch.append({
+                "id": code_id,
+                "content": code_block,
+                "metadata": {
+                    "type": "code",
+                    "language": "python",
+                    "user_story_ids": user_story_id_string  # Fixed: String instead of list
+                }
+            })
             
             code_artifacts.append({
                 "id": code_id,
-                "path": file_path,
+                "path": f"artifacts/code/{code_id}.py",
                 "content": code_block
             })
         
         # If no code blocks were extracted, save the raw output
         if not code_blocks:
             code_id = "code_artifact_raw"
-            file_path = f"artifacts/code/{code_id}.txt"
-            with open(file_path, "w") as f:
-                f.write(result)
             
             # Fix: Convert list to string for ChromaDB
             user_story_id_string = ",".join([f"user_story_{i+1}" for i in range(len(user_stories))])
             
-            if self.db_manager:
-                self.db_manager.store_artifact(
-                    artifact_id=code_id,
-                    content=result,
-                    metadata={
-                        "type": "code_raw",
-                        "user_story_ids": user_story_id_string  # Fixed: String instead of list
-                    }
-                )
+            db_batch.append({
+                "id": code_id,
+                "content": result,
+                "metadata": {
+                    "type": "code_raw",
+                    "user_story_ids": user_story_id_string  # Fixed: String instead of list
+                }
+            })
             
             code_artifacts.append({
                 "id": code_id,
-                "path": file_path,
+                "path": f"artifacts/code/{code_id}.txt",
                 "content": result
             })
         
-        return code_artifacts
\ No newline at end of file
+        self._store_artifacts(db_batch, code_artifacts)
+        
+        return code_artifacts
+    
+    def _build_story_prompt(self, story, template_content):
+        """Build the code generation prompt for a single user story"""
+        return f"""
+        You are an experienced Python Developer. Your task is to implement code based on the 
+        following user story.
+        
+        User Story:
+        {json.dumps(story, indent=2)}
+        
+        Code Template:
+        {template_content}
+        
+        Follow these guidelines:
+        1. Generate clean, maintainable Python code that implements the functionality described in the user story
+        2. Include proper error handling
+        3. Add comments explaining the key parts of your implementation
+        4. Make sure your code follows PEP 8 style guidelines
+        5. Return the code inside markdown code blocks with Python syntax highlighting
+        """
+    
+    def _generate_code_per_story(self, user_stories, template_content, batch_size):
+        """Generate one code artifact per user story using batched pipeline calls"""
+        story_ids = [story.get("id", f"user_story_{idx+1}") if isinstance(story, dict) else f"user_story_{idx+1}"
+                     for idx, story in enumerate(user_stories)]
+        prompts = [self._build_story_prompt(story, template_content) for story in user_stories]
+        
+        # Decoder-only models need left padding (and a pad token) to generate in a batch
+        tokenizer = getattr(self.pipeline, "tokenizer", None)
+        if tokenizer is not None:
+            if tokenizer.pad_token_id is None:
+                tokenizer.pad_token = tokenizer.eos_token
+            tokenizer.padding_side = "left"
+        
+        generation_kwargs = {
+            "max_new_tokens": 512,
+            "do_sample": True,
+            "temperature": 0.7,
+            "return_full_text": False
+        }
+        
+        results = []
+        stop_reports = []
+        for start in range(0, len(prompts), batch_size):
+            batch = prompts[start:start + batch_size]
+            # One fenced block per story prompt; rows stop independently. Criteria hold
+            # per-call state, so every batch gets fresh ones.
+            stopping_criteria = build_stopping_criteria(tokenizer, structure="fenced_blocks", n_blocks=1)
+            outputs = self.pipeline(batch, batch_size=len(batch), stopping_criteria=stopping_criteria,
+                                    **generation_kwargs)
+            for output in outputs:
+                if isinstance(output, list):
+                    output = output[0]
+                results.append(output.get("generated_text", "") if isinstance(output, dict) else str(output))
+            report = report_early_stop(stopping_criteria, max_new_tokens=512, label="Developer (per story)")
+            if report:
+                stop_reports.append(report)
+        
+        self.last_stop_report = {
+            "batches": stop_reports,
+            "tokens_saved": sum(report["tokens_saved"] for report in stop_reports)
+        }
+        
+        code_artifacts = []
+        db_batch = []
+        for story_id, result in zip(story_ids, results):
+            code_blocks = self._extract_code_blocks(result)
+            code_id = f"code_{story_id}"
+            
+            if code_blocks:
+                content = "\n\n".join(code_blocks)
+                file_path = f"artifacts/code/{code_id}.py"
+                metadata = {"type": "code", "language": "python"}
+            else:
+                # Keep the raw output so the story still has an artifact to review
+                content = result
+                file_path = f"artifacts/code/{code_id}.txt"
+                metadata = {"type": "code_raw"}
+            metadata["user_story_ids"] = story_id
+            
+            db_batch.append({"id": code_id, "content": content, "metadata": metadata})
+            
+            code_artifacts.append({
+                "id": code_id,
+                "path": file_path,
+                "content": content,
+                "user_story_id": story_id
+            })
+        
+        self._store_artifacts(db_batch, code_artifacts)
+        
+        return code_artifacts
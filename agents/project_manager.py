@@ -200,24 +200,39 @@ from langchain.agents import Tool
 from langchain.agents import AgentExecutor
 from langchain_core.output_parsers import StrOutputParser
 from langchain_community.llms import HuggingFacePipeline
-from transformers import pipeline, AutoModelForCausalLM, AutoTokenizer
+from llm.backends import TransformersBackend
 import json
 
+# Bounds on what a retrieval tool puts into the prompt
+TOOL_MAX_ARTIFACTS = 10
+TOOL_MAX_CHARS_PER_ARTIFACT = 1500
+
 class ProjectManagerAgent:
     def __init__(self, llm_model, db_manager=None):
-        if not isinstance(llm_model, str):
-            raise ValueError(f"llm_model must be a string! Got: {type(llm_model)}")
-        
-        print(f"✅ Loading Hugging Face model: {llm_model}")
-        
-        tokenizer = AutoTokenizer.from_pretrained(llm_model)
-        model = AutoModelForCausalLM.from_pretrained(llm_model)
-        
-        self.hf_pipeline = pipeline("text-generation", model=model, tokenizer=tokenizer, max_new_tokens=256)
-        # Create a HuggingFacePipeline wrapper for use with LangChain
-        self.llm = HuggingFacePipeline(pipeline=self.hf_pipeline)
+        """
+        Initialize the ProjectManagerAgent
+
+        Args:
+            llm_model: An LLM backend, or a Hugging Face model name to run locally
+            db_manager: Database manager for retrieving artifacts
+        """
+        self.generation_kwargs = {"max_new_tokens": 256}
+        if isinstance(llm_model, str):
+            # Reuse the weights already loaded by the other agents; repeated
+            # summary/overview/help prompts are answered from the response cache
+            llm_model = TransformersBackend(llm_model)
+        self.set_backend(llm_model)
         self.db_manager = db_manager
     
+    def set_backend(self, backend):
+        """Switch the PM to a different LLM backend"""
+        self.hf_pipeline = backend
+        if isinstance(backend, TransformersBackend):
+            # Create a HuggingFacePipeline wrapper for use with LangChain
+            self.llm = HuggingFacePipeline(pipeline=backend.pipeline, pipeline_kwargs=self.generation_kwargs)
+        else:
+            self.llm = backend
+    
     def get_status(self, query):
         """Get project status based on PM query."""
         tools = [
@@ -254,7 +269,7 @@ class ProjectManagerAgent:
                 query=query,
                 agent_scratchpad=""
             )
-            response = self.hf_pipeline(formatted_prompt)[0]['generated_text']
+            response = self.hf_pipeline(formatted_prompt, **self.generation_kwargs)[0]['generated_text']
             # Strip the original prompt if it's in the response
             if formatted_prompt in response:
                 response = response.replace(formatted_prompt, "").strip()
@@ -278,32 +293,49 @@ class ProjectManagerAgent:
             You are a Project Manager. Please provide a general response to this query 
             without using external tools: {query}
             """
-            response = self.hf_pipeline(formatted_prompt)[0]['generated_text']
+            response = self.hf_pipeline(formatted_prompt, **self.generation_kwargs)[0]['generated_text']
             if formatted_prompt in response:
                 response = response.replace(formatted_prompt, "").strip()
             return f"I had some difficulty processing that with my tools, but here's what I can tell you:\n\n{response}"
     
+    @staticmethod
+    def _truncate(content):
+        """Cut a content down to TOOL_MAX_CHARS_PER_ARTIFACT characters."""
+        content = content or ""
+        if len(content) > TOOL_MAX_CHARS_PER_ARTIFACT:
+            return content[:TOOL_MAX_CHARS_PER_ARTIFACT] + "... [truncated]"
+        return content
+    
+    def _dump_artifacts(self, artifact_type):
+        """Serialize the first TOOL_MAX_ARTIFACTS artifacts of a type, with long contents cut short."""
+        artifacts = []
+        for artifact in self.db_manager.iter_artifacts(artifact_type, page_size=TOOL_MAX_ARTIFACTS,
+                                                       limit=TOOL_MAX_ARTIFACTS):
+            artifact["content"] = self._truncate(artifact["content"])
+            artifacts.append(artifact)
+        return json.dumps(artifacts, indent=2)
+    
     def _retrieve_user_stories(self):
-        """Retrieve all user stories from the database."""
-        user_stories = self.db_manager.retrieve_artifacts_by_type("user_story")
-        return json.dumps(user_stories, indent=2)
+        """Retrieve user stories from the database."""
+        return self._dump_artifacts("user_story")
     
     def _retrieve_code(self):
-        """Retrieve all code artifacts from the database."""
-        code_artifacts = self.db_manager.retrieve_artifacts_by_type("code")
-        return json.dumps(code_artifacts, indent=2)
+        """Retrieve code artifacts from the database."""
+        return self._dump_artifacts("code")
     
     def _retrieve_test_cases(self):
-        """Retrieve all test cases from the database."""
-        test_cases = self.db_manager.retrieve_artifacts_by_type("test_case")
-        return json.dumps(test_cases, indent=2)
+        """Retrieve test cases from the database."""
+        return self._dump_artifacts("test_case")
     
     def _retrieve_test_results(self):
         """Retrieve test execution results from the database."""
-        test_results = self.db_manager.retrieve_artifacts_by_type("test_results")
-        return json.dumps(test_results, indent=2)
+        return self._dump_artifacts("test_results")
     
     def _search_artifacts(self, query):
-        """Search for artifacts based on query."""
-        artifacts = self.db_manager.search_artifacts(query)
+        """Search for artifacts based on query, bounded like the retrieval tools."""
+        artifacts = self.db_manager.search_artifacts(query)[:TOOL_MAX_ARTIFACTS]
+        for artifact in artifacts:
+            artifact["content"] = self._truncate(artifact.get("content"))
+            if artifact.get("matched_chunk"):
+                artifact["matched_chunk"]["content"] = self._truncate(artifact["matched_chunk"].get("content"))
         return json.dumps(artifacts, indent=2)
\ No newline at end of file
@@ -209,17 +209,21 @@
 
 # agents/tester.py
 from transformers import pipeline
+from llm.backends import TransformersBackend
+from llm.stopping import build_stopping_criteria, report_early_stop
+from llm.streaming import generate_streaming
 import json
-import os
 import re
 
-class TesterAgent:
+from .artifact_store import ArtifactStoreMixin
+
+class TesterAgent(ArtifactStoreMixin):
     def __init__(self, model=None, db_manager=None):
         """
         Initialize the TesterAgent with a Hugging Face pipeline
         
         Args:
-            model: The model to use (can be a string model name or a pre-initialized model)
+            model: The model to use (a string model name, an LLM backend or a pre-initialized pipeline)
             db_manager: Database manager for storing artifacts
         """
         # Initialize the pipeline correctly
@@ -227,13 +231,14 @@ class TesterAgent:
             # Create a default text-generation pipeline if no model is provided
             self.pipeline = pipeline(task="text-generation")
         elif isinstance(model, str):
-            # If a string is provided, treat it as a model name
-            self.pipeline = pipeline(task="text-generation", model=model)
+            # If a string is provided, get the shared model from the registry
+            self.pipeline = TransformersBackend(model)
         else:
             # If an object is provided, use it directly as the model
             self.pipeline = model
             
         self.db_manager = db_manager
+        self.last_stop_report = None
     
     def _extract_code_blocks(self, text):
         """Extract code blocks from markdown text"""
@@ -246,8 +251,16 @@ class TesterAgent:
         
         return code_blocks
     
-    def generate_test_cases(self, user_stories, code):
-        """Generate test cases based on user stories and code"""
+    def generate_test_cases(self, user_stories, code, stream_callback=None):
+        """
+        Generate test cases based on user stories and code
+
+        Args:
+            user_stories (list): User stories the tests should validate
+            code (list|str): Code artifacts to test
+            stream_callback (callable): Optional stream_callback(text_chunk, stats), called
+                as tokens are generated
+        """
         # Load test case template
         template_path = "database/templates/test_case.md"
         with open(template_path, "r") as f:
@@ -287,15 +300,24 @@ class TesterAgent:
         Ensure your test cases thoroughly validate the acceptance criteria from the user stories.
         """
         
-        # Generate test cases using HF pipeline
+        # Generate test cases using HF pipeline, stopping once the test block is closed
+        stopping_criteria = build_stopping_criteria(
+            getattr(self.pipeline, "tokenizer", None),
+            structure="fenced_blocks",
+            n_blocks=1
+        )
         generation_kwargs = {
             "max_length": 2048,
             "do_sample": True,
-            "temperature": 0.7
+            "temperature": 0.7,
+            "stopping_criteria": stopping_criteria
         }
         # Adjust based on pipeline type
-        if hasattr(self.pipeline, "generate"):
-            # For newer pipeline versions or language models
+        if stream_callback is not None:
+            # Stream tokens to the caller as they are generated
+            result = generate_streaming(self.pipeline, prompt, stream_callback, **generation_kwargs)
+        elif hasattr(self.pipeline, "generate") or hasattr(self.pipeline, "model"):
+            # For newer pipeline versions or language models (transformers pipelines expose .model)
             result = self.pipeline(prompt, **generation_kwargs)[0]['generated_text']
         else:
             # For text2text or chat models which might have different APIs
@@ -310,67 +332,68 @@ class TesterAgent:
             else:
                 result = str(result)  # Fallback
         
+        self.last_stop_report = report_early_stop(stopping_criteria, max_length=2048, label="Tester")
+        
         # Extract test code blocks from the result
         test_code_blocks = self._extract_code_blocks(result)
         
         # Save the generated test cases
-        os.makedirs("artifacts/test_cases", exist_ok=True)
-        
         test_artifacts = []
+        db_batch = []
         for idx, test_code in enumerate(test_code_blocks):
             test_id = f"test_case_{idx+1}"
             
-            # Save to ChromaDB if db_manager is available
-            if self.db_manager:
-                self.db_manager.store_artifact(
-                    artifact_id=test_id,
-                    content=test_code,
-                    metadata={
-                        "type": "test_case",
-                        "language": "python",
-                        "framework": "pytest",
-                        "user_story_ids": [f"user_story_{i+1}" for i in range(len(user_stories))]
-                    }
-                )
-            
-            # Save to file system
-            file_path = f"artifacts/test_cases/{test_id}.py"
-            with open(file_path, "w") as f:
-                f.write(test_code)
+            db_batch.append({
+                "id": test_id,
+                "content": test_code,
+                "metadata": {
+                    "type": "test_case",
+                    "language": "python",
+                    "framework": "pytest",
+                    "user_story_ids": [f"user_story_{i+1}" for i in range(len(user_stories))]
+                }
+            })
             
             test_artifacts.append({
                 "id": test_id,
-                "path": file_path,
+                "path": f"artifacts/test_cases/{test_id}.py",
                 "content": test_code
             })
         
         # If no test blocks were extracted, save the raw output
         if not test_code_blocks:
             test_id = "test_case_raw"
-            file_path = f"artifacts/test_cases/{test_id}.txt"
-            with open(file_path, "w") as f:
-                f.write(result)
             
-            if self.db_manager:
-                self.db_manager.store_artifact(
-                    artifact_id=test_id,
-                    content=result,
-                    metadata={
-                        "type": "test_case_raw",
-                        "user_story_ids": [f"user_story_{i+1}" for i in range(len(user_stories))]
-                    }
-                )
+            db_batch.append({
+                "id": test_id,
+                "content": result,
+                "metadata": {
+                    "type": "test_case_raw",
+                    "user_story_ids": [f"user_story_{i+1}" for i in range(len(user_stories))]
+                }
+            })
             
             test_artifacts.append({
                 "id": test_id,
-                "path": file_path,
+                "path": f"artifacts/test_cases/{test_id}.txt",
                 "content": result
             })
         
+        # Save to ChromaDB (if available) in one batched write
+        self._store_artifacts(db_batch, test_artifacts)
+        
         return test_artifacts
     
-    def execute_tests(self, code, test_cases):
-        """Simulate execution of tests against the code"""
+    def execute_tests(self, code, test_cases, stream_callback=None):
+        """
+        Simulate execution of tests against the code
+
+        Args:
+            code (list|str): Code artifacts under test
+            test_cases (list|str): Test artifacts to evaluate
+            stream_callback (callable): Optional stream_callback(text_chunk, stats), called
+                as tokens are generated
+        """
         # In a real app, you'd actually run the tests
         # Here we'll simulate by having the model analyze if tests would pass
         
@@ -408,15 +431,20 @@ class TesterAgent:
         }}
         """
         
-        # Analyze tests using HF pipeline
+        # Analyze tests using HF pipeline, stopping once the JSON array is closed
+        stopping_criteria = build_stopping_criteria(getattr(self.pipeline, "tokenizer", None), structure="json_array")
         generation_kwargs = {
             "max_length": 2048,
-            "do_sample": False
+            "do_sample": False,
+            "stopping_criteria": stopping_criteria
         }
         
         # Adjust based on pipeline type
-        if hasattr(self.pipeline, "generate"):
-            # For newer pipeline versions or language models
+        if stream_callback is not None:
+            # Stream tokens to the caller as they are generated
+            result = generate_streaming(self.pipeline, prompt, stream_callback, **generation_kwargs)
+        elif hasattr(self.pipeline, "generate") or hasattr(self.pipeline, "model"):
+            # For newer pipeline versions or language models (transformers pipelines expose .model)
             result = self.pipeline(prompt, **generation_kwargs)[0]['generated_text']
         else:
             # For text2text or chat models which might have different APIs
@@ -431,6 +459,8 @@ class TesterAgent:
             else:
                 result = str(result)  # Fallback
         
+        self.last_stop_report = report_early_stop(stopping_criteria, max_length=2048, label="Test executor")
+        
         # Try to parse the result as JSON
         try:
             # Find JSON in the response (it might contain explanatory text)
@@ -448,19 +478,11 @@ class TesterAgent:
                 "fix_suggestion": "N/A"
             }]
         
-        # Save test results
-        os.makedirs("artifacts/test_cases", exist_ok=True)
-        with open("artifacts/test_cases/test_results.json", "w") as f:
-            json.dump(test_results, f, indent=2)
-        
-        # Save to ChromaDB if available
-        if self.db_manager:
-            self.db_manager.store_artifact(
-                artifact_id="test_results",
-                content=json.dumps(test_results),
-                metadata={
-                    "type": "test_results"
-                }
-            )
+        # Save test results to ChromaDB, or to a file if that is not available
+        content = json.dumps(test_results, indent=2)
+        self._store_artifacts(
+            [{"id": "test_results", "content": content, "metadata": {"type": "test_results"}}],
+            [{"id": "test_results", "path": "artifacts/test_cases/test_results.json", "content": content}]
+        )
         
-        return test_results
\ No newline at end of file
+        return test_results
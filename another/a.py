@@ -1,25 +1,28 @@
 import streamlit as st
-from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM
 import torch
 import pandas as pd
 from datetime import datetime, timedelta
 import random
 import matplotlib.pyplot as plt
-import requests
 from create_project import render_create_project
 from projects import render_projects
 import os
 import json
 from pm_chatbot import render_pm_chatbot
-# Load model and tokenizer
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm.model_registry import get_model_registry
+from llm.backends import OllamaBackend
+from llm.ollama_client import generate_many
+import asyncio
+# Load model and tokenizer (shared process-wide through the model registry)
 @st.cache_resource
 def load_model():
     model_name = "Salesforce/codegen-350M-mono"
-    tokenizer = AutoTokenizer.from_pretrained(model_name)
-    model = AutoModelForCausalLM.from_pretrained(model_name)
-    return pipeline("text-generation", model=model, tokenizer=tokenizer)
+    return get_model_registry().acquire(model_name)
 
 code_gen = load_model()
+code_llm = OllamaBackend(model="codellama:7b")
 
 # Initialize session state for storing tickets
 if "tickets" not in st.session_state:
@@ -116,22 +119,22 @@ def generate_user_stories(reqs, project_id):
     return stories
 
 
-def smart_code_generation(user_story):
-    prompt = f"Write a Python function based on the following user story:\n\n{user_story}\n\n# Python Code:\n"
-    response = requests.post("http://localhost:11434/api/generate", json={
-        "model": "codellama:7b",
-        "prompt": prompt,
-        "stream": False  # stream=True can be handled differently
-    })
+def code_prompt(user_story):
+    return f"Write a Python function based on the following user story:\n\n{user_story}\n\n# Python Code:\n"
+
+
+def test_prompt(user_story):
+    return f"Write Python test cases for the following user story:\n\n{user_story}\n\n# Test Cases:\n"
 
+
+def smart_code_generation(user_story):
+    prompt = code_prompt(user_story)
     try:
-        data = response.json()
-        if "response" in data:
-            return data["response"].strip()
-        else:
-            return f"❌ Error: Unexpected response format: {data}"
+        return code_llm.complete(prompt).strip()
+    except ValueError as e:
+        return f"❌ Error: {str(e)}"
     except Exception as e:
-        return f"❌ Exception while parsing Ollama response: {str(e)}"
+        return f"❌ Exception while calling Ollama: {str(e)}"
 
 
 # def generate_test_cases(user_story):
@@ -139,13 +142,34 @@ def smart_code_generation(user_story):
 #     result = code_gen(prompt, max_new_tokens=200, do_sample=True, temperature=0.7)[0]['generated_text']
 #     return result.split("# Test Cases:")[-1].strip()
 def generate_test_cases(user_story):
-    prompt = f"Write Python test cases for the following user story:\n\n{user_story}\n\n# Test Cases:\n"
-    response = requests.post("http://localhost:11434/api/generate", json={
-        "model": "codellama:7b",
-        "prompt": prompt,
-        "stream": False
-    })
-    return response.json()["response"].strip()
+    prompt = test_prompt(user_story)
+    return code_llm.complete(prompt).strip()
+
+
+async def render_generate_all(tickets, max_workers):
+    """Generate code and tests for many tickets concurrently, rendering each result as it lands"""
+    placeholders = {}
+    jobs = []
+    for ticket in tickets:
+        st.markdown(f"**{ticket['id']}: {ticket['summary']}**")
+        code_col, test_col = st.columns(2)
+        placeholders[(ticket["id"], "code")] = code_col.empty()
+        placeholders[(ticket["id"], "tests")] = test_col.empty()
+        placeholders[(ticket["id"], "code")].info("⏳ Code queued...")
+        placeholders[(ticket["id"], "tests")].info("⏳ Tests queued...")
+        jobs.append(((ticket["id"], "code"), code_prompt(ticket["description"])))
+        jobs.append(((ticket["id"], "tests"), test_prompt(ticket["description"])))
+
+    progress = st.progress(0)
+    done = 0
+    async for key, text, error in generate_many(jobs, model=code_llm.model, base_url=code_llm.client.base_url,
+                                                  max_workers=max_workers):
+        if error is not None:
+            placeholders[key].error(f"❌ Exception while calling Ollama: {str(error)}")
+        else:
+            placeholders[key].code(text, language="python")
+        done += 1
+        progress.progress(done / len(jobs))
 
 # BACKLOG PAGE (same as you had before, omitted here for brevity)
 if page == "Backlog":
@@ -369,6 +393,19 @@ elif page == "Code Generator":
         
         else:
             st.info("No tickets available. Create some tickets in the Backlog first.")
+        
+        # Generate code and tests for a whole batch of tickets at once
+        st.subheader("⚡ Generate All")
+        batch_options = st.multiselect(
+            "Tickets to generate code and tests for",
+            list(ticket_options.keys()),
+            default=[key for key, t in ticket_options.items() if t["status"] != "Done"]
+        )
+        max_workers = st.slider("Parallel generations", min_value=1, max_value=code_llm.client.max_concurrency,
+                                value=code_llm.client.max_concurrency,
+                                help="Shares the OLLAMA_MAX_CONCURRENCY limit with every other Ollama call")
+        if st.button("Generate All") and batch_options:
+            asyncio.run(render_generate_all([ticket_options[key] for key in batch_options], max_workers))
 
 
 # CODE GENERATOR PAGE (same as before, omitted)
@@ -1,24 +1,23 @@
 import streamlit as st
 import requests
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from llm.backends import OllamaBackend
+
+chat_llm = OllamaBackend(model="codellama:7b")  # or "mistral" or any model you pulled
 
 # Talk to Ollama
 def pm_chatbot(query):
     try:
-        response = requests.post(
-            "http://localhost:11434/api/generate",
-            json={
-                "model": "codellama:7b",  # or "mistral" or any model you pulled
-                "prompt": (
-                    "You are a helpful AI assistant that explains software project management concepts like "
-                    "user stories, backlog, story points, testing strategies, code improvement tips, etc.\n\n"
-                    f"User: {query}\nAssistant:"
-                ),
-                "stream": False
-            }
+        response = chat_llm.complete(
+            "You are a helpful AI assistant that explains software project management concepts like "
+            "user stories, backlog, story points, testing strategies, code improvement tips, etc.\n\n"
+            f"User: {query}\nAssistant:"
         )
-        response.raise_for_status()
-        result = response.json()
-        return result.get("response", "Sorry, I didn't get that.")
+        return response or "Sorry, I didn't get that."
+    except ValueError:
+        return "Sorry, I didn't get that."
     except requests.exceptions.RequestException as e:
         return f"⚠️ Couldn't connect to Ollama: {e}"
 
@@ -3,7 +3,6 @@ import streamlit as st
 import json
 import os
 from dotenv import load_dotenv
-import time
 import ast
 import inspect
 # from another import a
@@ -15,12 +14,18 @@ sys.path.append('C:/Users/basad/Downloads/PROJECT/COLLEGE_PROJECT/demo')
 load_dotenv()
 
 # Import our project modules
-from agents.agent_manager import AgentManager
-from database.db_manager import DatabaseManager
+from app_context import AppContext
+from llm.backends import OllamaBackend
+from llm.ollama_client import get_ollama_client
 
-# Initialize the managers
-db_manager = DatabaseManager()
-agent_manager = AgentManager()
+# Build the managers once per process; Streamlit reruns and other sessions reuse them
+@st.cache_resource(show_spinner=False)
+def get_app_context():
+    return AppContext()
+
+app_context = get_app_context()
+db_manager = app_context.db_manager
+agent_manager = app_context.agent_manager
 
 # Set page config
 st.set_page_config(
@@ -41,6 +46,15 @@ You can provide business requirements and interact with the Project Manager to t
 with st.sidebar:
     st.header("Project Controls")
     
+    # Backend selection
+    backend_option = st.radio(
+        "LLM Backend",
+        ["As configured", "Local transformers", "Ollama", "Fake (offline)"],
+        index=0,
+        help="Where the agents run their generations. \"As configured\" keeps the "
+             "<ROLE>_BACKEND / LLM_BACKEND settings the app was started with"
+    )
+    
     # Model selection
     model_option = st.selectbox(
         "Select Ollama Model",
@@ -50,13 +64,29 @@ with st.sidebar:
         help="Select which Ollama model to use for the agents"
     )
     
+    # Backend per agent: the code-heavy agents get codellama on Ollama
+    if backend_option == "As configured":
+        backend_specs = dict(agent_manager.configured_backend_specs)
+    elif backend_option == "Ollama":
+        backend_specs = {
+            "business_analyst": f"ollama:{model_option}",
+            "developer": "ollama:codellama:7b",
+            "tester": "ollama:codellama:7b",
+            "project_manager": f"ollama:{model_option}",
+        }
+    elif backend_option == "Fake (offline)":
+        backend_specs = {role: "fake" for role in ["business_analyst", "developer", "tester", "project_manager"]}
+    else:
+        backend_specs = {role: f"transformers:{agent_manager.llm_model}"
+                         for role in ["business_analyst", "developer", "tester", "project_manager"]}
+    
     # Display model information
     st.info(f"""
-    Using Ollama models:
-    - Business Analyst: {model_option}
-    - Developer: codellama (recommended for code)
-    - QA Tester: codellama (recommended for tests)
-    - Project Manager: {model_option}
+    Using backends:
+    - Business Analyst: {backend_specs["business_analyst"]}
+    - Developer: {backend_specs["developer"]}
+    - QA Tester: {backend_specs["tester"]}
+    - Project Manager: {backend_specs["project_manager"]}
     """)
     
     # Project phase selection
@@ -64,6 +94,12 @@ with st.sidebar:
     
     run_all = st.button("Run Full Project Lifecycle")
     
+    constrained_stories = st.checkbox(
+        "Constrain user stories to valid JSON",
+        value=False,
+        help="Only let the Business Analyst emit JSON matching the user story schema"
+    )
+    
     col1, col2 = st.columns(2)
     with col1:
         run_ba = st.button("1. Generate User Stories")
@@ -104,18 +140,19 @@ if "test_results" not in st.session_state:
 if "conversation_history" not in st.session_state:
     st.session_state.conversation_history = []
 
+# Point each agent at its selected backend (only rebuilt when the selection changes)
+for role, spec in backend_specs.items():
+    if spec is not None and agent_manager.backends[role].describe() != spec:
+        agent_manager.set_backend(role, spec)
+
 # Status indicator for Ollama connection
 ollama_status_container = st.empty()
-try:
-    # Update the agent_manager with the selected model
-    agent_manager.llm_model = model_option
-    agent_manager.llm = agent_manager.llm.__class__(
-        model=model_option,
-        base_url="http://localhost:11434"
-    )
+if not any((spec or "").startswith("ollama:") for spec in backend_specs.values()):
+    ollama_status_container.success(f"✅ Using {backend_option} backend")
+elif OllamaBackend(model=model_option).is_available():
     ollama_status_container.success("✅ Connected to Ollama service")
-except Exception as e:
-    ollama_status_container.error(f"❌ Could not connect to Ollama service: {str(e)}")
+else:
+    ollama_status_container.error("❌ Could not connect to Ollama service")
     st.info("""
     To use this application, you need to have Ollama installed and running.
     Visit https://ollama.com/ to download and install Ollama.
@@ -138,38 +175,41 @@ business_requirements = st.text_area(
 if business_requirements != st.session_state.business_requirements:
     st.session_state.business_requirements = business_requirements
 
+def make_stream_renderer():
+    """Create a stream_callback that renders generated tokens and real progress"""
+    progress_bar = st.progress(0)
+    stats_text = st.empty()
+    output = st.empty()
+    chunks = []
+
+    def on_chunk(chunk, stats):
+        chunks.append(chunk)
+        progress_bar.progress(stats.progress)
+        stats_text.text(f"{stats.tokens} tokens generated · {stats.tokens_per_second:.1f} tokens/s")
+        output.code("".join(chunks), language="markdown")
+
+    def clear():
+        progress_bar.empty()
+        output.empty()
+
+    return on_chunk, clear
+
 # Run the project phases
 if run_all or run_ba:
     if not st.session_state.business_requirements:
         st.error("Please enter business requirements first.")
     else:
         with st.spinner("Business Analyst is generating user stories..."):
-            # Add a progress indicator
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            status_text.text("Initializing Business Analyst agent...")
-            progress_bar.progress(10)
-            time.sleep(0.5)
-            
-            status_text.text("Processing requirements...")
-            progress_bar.progress(30)
+            stream_callback, clear_stream = make_stream_renderer()
             
             # Call the BA agent to generate user stories
             st.session_state.user_stories = agent_manager.process_business_requirements(
-                st.session_state.business_requirements
+                st.session_state.business_requirements,
+                stream_callback=stream_callback,
+                constrained=constrained_stories
             )
             
-            progress_bar.progress(90)
-            status_text.text("Finalizing user stories...")
-            time.sleep(0.5)
-            
-            progress_bar.progress(100)
-            status_text.text("Complete!")
-            time.sleep(0.5)
-            
-            status_text.empty()
-            progress_bar.empty()
+            clear_stream()
             
             st.success(f"Generated {len(st.session_state.user_stories)} user stories!")
 
@@ -178,36 +218,15 @@ if run_all or run_dev:
         st.error("Please generate user stories first.")
     else:
         with st.spinner("Developer is writing code..."):
-            # Add a progress indicator
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            status_text.text("Initializing Developer agent...")
-            progress_bar.progress(10)
-            time.sleep(0.5)
-            
-            status_text.text("Analyzing user stories...")
-            progress_bar.progress(30)
-            time.sleep(0.5)
-            
-            status_text.text("Writing code...")
-            progress_bar.progress(50)
+            stream_callback, clear_stream = make_stream_renderer()
             
             # Call the Dev agent to generate code
             st.session_state.code_artifacts = agent_manager.develop_code(
-                st.session_state.user_stories
+                st.session_state.user_stories,
+                stream_callback=stream_callback
             )
             
-            progress_bar.progress(90)
-            status_text.text("Optimizing code...")
-            time.sleep(0.5)
-            
-            progress_bar.progress(100)
-            status_text.text("Complete!")
-            time.sleep(0.5)
-            
-            status_text.empty()
-            progress_bar.empty()
+            clear_stream()
             
             st.success(f"Generated {len(st.session_state.code_artifacts)} code artifacts!")
 
@@ -216,37 +235,16 @@ if run_all or run_test:
         st.error("Please generate user stories and code first.")
     else:
         with st.spinner("QA Tester is creating test cases..."):
-            # Add a progress indicator
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            status_text.text("Initializing QA Tester agent...")
-            progress_bar.progress(10)
-            time.sleep(0.5)
-            
-            status_text.text("Analyzing code and requirements...")
-            progress_bar.progress(30)
-            time.sleep(0.5)
-            
-            status_text.text("Designing test cases...")
-            progress_bar.progress(50)
+            stream_callback, clear_stream = make_stream_renderer()
             
             # Call the Test agent to generate test cases
             st.session_state.test_artifacts = agent_manager.create_test_cases(
                 st.session_state.user_stories, 
-                st.session_state.code_artifacts
+                st.session_state.code_artifacts,
+                stream_callback=stream_callback
             )
             
-            progress_bar.progress(90)
-            status_text.text("Finalizing test cases...")
-            time.sleep(0.5)
-            
-            progress_bar.progress(100)
-            status_text.text("Complete!")
-            time.sleep(0.5)
-            
-            status_text.empty()
-            progress_bar.empty()
+            clear_stream()
             
             st.success(f"Generated {len(st.session_state.test_artifacts)} test cases!")
 
@@ -255,37 +253,16 @@ if run_all or run_execute:
         st.error("Please generate code and test cases first.")
     else:
         with st.spinner("QA Tester is executing tests..."):
-            # Add a progress indicator
-            progress_bar = st.progress(0)
-            status_text = st.empty()
-            
-            status_text.text("Initializing test execution...")
-            progress_bar.progress(10)
-            time.sleep(0.5)
-            
-            status_text.text("Setting up test environment...")
-            progress_bar.progress(30)
-            time.sleep(0.5)
-            
-            status_text.text("Running tests...")
-            progress_bar.progress(50)
+            stream_callback, clear_stream = make_stream_renderer()
             
             # Call the Test agent to execute tests
             st.session_state.test_results = agent_manager.execute_tests(
                 st.session_state.code_artifacts, 
-                st.session_state.test_artifacts
+                st.session_state.test_artifacts,
+                stream_callback=stream_callback
             )
             
-            progress_bar.progress(80)
-            status_text.text("Analyzing test results...")
-            time.sleep(0.5)
-            
-            progress_bar.progress(100)
-            status_text.text("Complete!")
-            time.sleep(0.5)
-            
-            status_text.empty()
-            progress_bar.empty()
+            clear_stream()
             
             st.success(f"Executed {len(st.session_state.test_results)} tests!")
 
@@ -517,14 +494,16 @@ with st.sidebar.expander("Ollama Status"):
     if st.button("Check Ollama Connection"):
         try:
             # Try to call a simple prompt to check if Ollama is responding
-            from langchain_community.llms import Ollama
-            test_ollama = Ollama(model=model_option, base_url="http://localhost:11434")
-            result = test_ollama.invoke("Hello")
+            result = OllamaBackend(model=model_option).complete("Hello")
             st.success(f"✅ Connected to Ollama service\nModel: {model_option}\nResponse: {result[:50]}...")
         except Exception as e:
             st.error(f"❌ Could not connect to Ollama service: {str(e)}")
             st.info("Make sure Ollama is running and the models are installed.")
     
+    # Latency and queueing of the shared, pooled Ollama client
+    st.markdown("**Client metrics**")
+    st.json(get_ollama_client().metrics())
+    
     st.markdown("""
     ### Ollama Commands
     ```bash
@@ -540,6 +519,21 @@ with st.sidebar.expander("Ollama Status"):
     ```
     """)
 
+# Artifact store read cache and background re-indexing
+with st.sidebar.expander("Artifact Store Cache"):
+    st.caption(f"Project: {app_context.project_id or 'shared'} · Run: {app_context.run_id}")
+    if st.button("Start New Run", help="Keep this run's artifacts and write the next phases to a fresh run"):
+        st.success(f"✅ Started {app_context.start_run()}")
+    for collection_name, reindex in db_manager.reindex_status().items():
+        if reindex["state"] == "running":
+            st.progress(reindex["progress"], text=f"Re-indexing {collection_name}: {reindex['done']}/{reindex['total']}")
+        elif reindex["state"] == "failed":
+            st.error(f"Re-indexing {collection_name} failed: {reindex['error']}")
+    cache_stats = db_manager.query_cache_stats()
+    st.metric("Hit rate", f"{cache_stats['hit_rate']:.0%}")
+    st.metric("Latency saved", f"{cache_stats['saved_seconds'] * 1000:.0f} ms")
+    st.json(cache_stats)
+
 # Footer
 st.markdown("---")
 st.markdown("🚀 Project Team Simulation | Powered by Ollama, Streamlit, and ChromaDB")
@@ -0,0 +1,68 @@
+# app_context.py
+"""
+Application context shared across Streamlit reruns and sessions
+"""
+import os
+import threading
+import time
+
+from agents.agent_manager import AgentManager
+from database.db_manager import DatabaseManager
+
+
+class AppContext:
+    def __init__(self, project_id=None, run_id=None):
+        """
+        Hold one Chroma client and one agent set for the whole process
+
+        Both are created on first access, so pages that never touch the agents
+        do not pay for loading the models. The agents read and write through a
+        view of the store scoped to one project and run, so a new run never
+        overwrites the artifacts of an earlier one.
+
+        Args:
+            project_id (str): Project collection to use. Defaults to PROJECT_ID from
+                the environment, or the shared collection
+            run_id (str): Run to tag artifacts with. Defaults to RUN_ID from the
+                environment, or one named after the start time of the process
+        """
+        self.project_id = project_id or os.environ.get("PROJECT_ID") or None
+        self.run_id = run_id or os.environ.get("RUN_ID") or time.strftime("run-%Y%m%d-%H%M%S")
+        self._lock = threading.Lock()
+        self._db_manager = None
+        self._agent_manager = None
+
+    @property
+    def db_manager(self):
+        with self._lock:
+            if self._db_manager is None:
+                self._db_manager = DatabaseManager().scoped(self.project_id, self.run_id)
+            return self._db_manager
+
+    def start_run(self, run_id=None):
+        """
+        Switch the agents to a new run of the same project
+
+        Args:
+            run_id (str): Name of the run (defaults to one named after the current time)
+
+        Returns:
+            str: The new run id
+        """
+        run_id = run_id or time.strftime("run-%Y%m%d-%H%M%S")
+        db_manager = self.db_manager.scoped(self.project_id, run_id)
+        with self._lock:
+            self.run_id = run_id
+            self._db_manager = db_manager
+            agent_manager = self._agent_manager
+        if agent_manager is not None:
+            agent_manager.set_db_manager(db_manager)
+        return run_id
+
+    @property
+    def agent_manager(self):
+        db_manager = self.db_manager
+        with self._lock:
+            if self._agent_manager is None:
+                self._agent_manager = AgentManager(db_manager=db_manager)
+            return self._agent_manager
@@ -0,0 +1,118 @@
+# benchmarks/hnsw_benchmark.py
+"""
+HNSW index benchmark for the artifact store
+
+Loads N synthetic artifacts (random unit vectors with the dimension of
+all-MiniLM-L6-v2) into a DatabaseManager collection for each index
+configuration and reports build time, p50/p99 query latency, recall@k
+against exact brute-force search and the on-disk size of the store.
+
+Usage:
+    python benchmarks/hnsw_benchmark.py --artifacts 20000 --queries 200 --k 10
+    python benchmarks/hnsw_benchmark.py --configs 16:100:10 16:100:100 32:200:200
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from database.db_manager import DatabaseManager
+
+DIMENSION = 384
+# M:construction_ef:search_ef
+DEFAULT_CONFIGS = ["16:100:10", "16:100:50", "16:100:100", "32:200:100"]
+
+
+def _unit_vectors(rng, count):
+    vectors = rng.standard_normal((count, DIMENSION)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def _exact_neighbors(corpus, queries, k):
+    """Ground-truth top-k ids by brute force (on unit vectors l2, cosine and ip rank alike)"""
+    scores = queries @ corpus.T
+    return np.argsort(-scores, axis=1)[:, :k]
+
+
+def _dir_size(path):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(path) for name in files)
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def _run(position, config, corpus, queries, truth, args):
+    m, construction_ef, search_ef = (int(part) for part in config.split(":"))
+    index_config = {"space": args.space, "M": m, "construction_ef": construction_ef, "search_ef": search_ef}
+
+    # Chroma keeps one client per path, so every configuration gets its own
+    # collection in the same scratch store and its size is measured as a delta
+    size_before = _dir_size("chroma_db") if os.path.isdir("chroma_db") else 0
+    db_manager = DatabaseManager(f"hnsw_benchmark_{position}", index_config=index_config, query_cache_size=0)
+    collection = db_manager.collection
+    ids = [f"artifact_{i}" for i in range(len(corpus))]
+    batch_size = db_manager.client.get_max_batch_size()
+
+    # Vectors are precomputed, so this measures index construction and not the embedding model
+    start = time.perf_counter()
+    for offset in range(0, len(corpus), batch_size):
+        collection.add(
+            ids=ids[offset:offset + batch_size],
+            documents=[f"Synthetic artifact {i}" for i in range(offset, min(offset + batch_size, len(corpus)))],
+            embeddings=corpus[offset:offset + batch_size].tolist(),
+            metadatas=[{"type": "synthetic"}] * len(ids[offset:offset + batch_size])
+        )
+    build_seconds = time.perf_counter() - start
+
+    latencies = []
+    hits = 0
+    for query, expected in zip(queries, truth):
+        start = time.perf_counter()
+        result = collection.query(query_embeddings=[query.tolist()], n_results=args.k, include=[])
+        latencies.append((time.perf_counter() - start) * 1000)
+        found = {int(artifact_id.rsplit("_", 1)[1]) for artifact_id in result["ids"][0]}
+        hits += len(found & set(expected.tolist()))
+
+    recall = hits / (len(queries) * args.k)
+    size_mb = (_dir_size("chroma_db") - size_before) / (1024 * 1024)
+    print(f"{config:<14} {build_seconds:9.1f} s  {_percentile(latencies, 0.5):8.2f}  "
+          f"{_percentile(latencies, 0.99):8.2f}  {recall:9.3f}  {size_mb:9.1f} MB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--artifacts", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], default="l2")
+    parser.add_argument("--configs", nargs="+", default=DEFAULT_CONFIGS,
+                        help="Index settings as M:construction_ef:search_ef")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    corpus = _unit_vectors(rng, args.artifacts)
+    queries = _unit_vectors(rng, args.queries)
+    truth = _exact_neighbors(corpus, queries, args.k)
+
+    print(f"{args.artifacts} artifacts, {args.queries} queries, k={args.k}, space={args.space}\n")
+    print(f"{'M:cef:sef':<14} {'build':>11}  {'p50 ms':>8}  {'p99 ms':>8}  {'recall@' + str(args.k):>9}  {'disk':>12}")
+    # Run in a scratch directory so the benchmark store doesn't touch ./chroma_db
+    workdir = tempfile.mkdtemp(prefix="hnsw_bench_")
+    os.chdir(workdir)
+    for position, config in enumerate(args.configs):
+        _run(position, config, corpus, queries, truth, args)
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
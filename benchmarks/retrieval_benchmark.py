@@ -0,0 +1,118 @@
+# benchmarks/retrieval_benchmark.py
+"""
+Retrieval benchmark for DatabaseManager.search_artifacts
+
+Loads the artifacts saved under artifacts/ (user stories and generated code)
+into a scratch store, derives queries with a known answer from them (story
+titles, and "code for <name>" for every function and class), then reports
+recall@k and p50/p95 latency for vector, keyword and hybrid search.
+
+Usage:
+    python benchmarks/retrieval_benchmark.py --k 1 3 5 --distractors 200
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from database.db_manager import DatabaseManager
+
+MODES = ("vector", "keyword", "hybrid")
+
+
+def _load_artifacts(artifacts_dir):
+    """Saved artifacts plus (query, expected id) pairs derived from them"""
+    artifacts = []
+    queries = []
+    for path in sorted(glob.glob(os.path.join(artifacts_dir, "user_stories", "*.json"))):
+        with open(path) as f:
+            story = json.load(f)
+        artifact_id = os.path.splitext(os.path.basename(path))[0]
+        artifacts.append({"id": artifact_id, "content": json.dumps(story), "metadata": {"type": "user_story"}})
+        if story.get("title"):
+            queries.append((story["title"], artifact_id))
+    for path in sorted(glob.glob(os.path.join(artifacts_dir, "code", "*.py"))):
+        with open(path) as f:
+            code = f.read()
+        artifact_id = os.path.splitext(os.path.basename(path))[0]
+        artifacts.append({"id": artifact_id, "content": code, "metadata": {"type": "code", "language": "python"}})
+        for name in re.findall(r"^\s*(?:def|class)\s+(\w+)", code, re.MULTILINE):
+            queries.append((f"show me the code for {name}", artifact_id))
+    return artifacts, queries
+
+
+def _distractors(count):
+    """Unrelated stories so the target has to be found in a larger store"""
+    return [
+        {
+            "id": f"distractor_{i}",
+            "content": json.dumps({
+                "title": f"Report {i} export",
+                "description": f"As an analyst, I want report {i} exported as CSV so that I can share it.",
+                "priority": "Low",
+            }),
+            "metadata": {"type": "user_story"},
+        }
+        for i in range(count)
+    ]
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--artifacts-dir", default=os.path.join(ROOT, "artifacts"))
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--distractors", type=int, default=200)
+    args = parser.parse_args()
+
+    artifacts, queries = _load_artifacts(args.artifacts_dir)
+    if not queries:
+        print(f"No artifacts with usable queries under {args.artifacts_dir}")
+        return
+
+    # Run in a scratch directory so the benchmark store doesn't touch ./chroma_db
+    workdir = tempfile.mkdtemp(prefix="retrieval_bench_")
+    os.chdir(workdir)
+
+    # Measure the search itself, not the query result cache
+    db_manager = DatabaseManager("retrieval_benchmark", query_cache_size=0)
+    db_manager.store_artifacts(artifacts + _distractors(args.distractors))
+    # Build the keyword index and load the embedding model outside the timings
+    db_manager.search_artifacts("warm up", n_results=1)
+
+    max_k = max(args.k)
+    print(f"{len(queries)} queries over {len(artifacts) + args.distractors} artifacts\n")
+    header = f"{'mode':<8}" + "".join(f"  recall@{k:<3}" for k in args.k) + "     p50 ms     p95 ms"
+    print(header)
+    print("-" * len(header))
+    for mode in MODES:
+        hits = {k: 0 for k in args.k}
+        latencies = []
+        for query, expected_id in queries:
+            start = time.perf_counter()
+            results = db_manager.search_artifacts(query, n_results=max_k, mode=mode)
+            latencies.append((time.perf_counter() - start) * 1000)
+            ranked_ids = [artifact["id"] for artifact in results]
+            for k in args.k:
+                if expected_id in ranked_ids[:k]:
+                    hits[k] += 1
+        recalls = "".join(f"  {hits[k] / len(queries):9.2f}" for k in args.k)
+        print(f"{mode:<8}{recalls}  {_percentile(latencies, 0.5):9.2f}  {_percentile(latencies, 0.95):9.2f}")
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
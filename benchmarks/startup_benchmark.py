@@ -0,0 +1,97 @@
+# benchmarks/startup_benchmark.py
+"""
+Startup benchmark for the Streamlit app
+
+Compares how long one script rerun spends building the managers:
+
+- before: every rerun constructs a DatabaseManager plus an AgentManager that
+  opens its own DatabaseManager and loads facebook/opt-125m twice (a pipeline
+  for the agents and a separate AutoModelForCausalLM for the project manager)
+- after: reruns share one cached AppContext (what app.py does with
+  st.cache_resource), so only the first, cold run pays for construction
+
+Usage:
+    python benchmarks/startup_benchmark.py --reruns 5
+"""
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+from app_context import AppContext
+from database.db_manager import DatabaseManager
+import llm.model_registry as model_registry
+
+LLM_MODEL = "facebook/opt-125m"
+
+
+def _rerun_before():
+    """One rerun of the old module-level initialisation, rebuilt without the model registry"""
+    db_manager = DatabaseManager()
+    # AgentManager opened a second DatabaseManager and its own agents pipeline...
+    agent_db_manager = DatabaseManager()
+    agents_pipeline = pipeline("text-generation", model=LLM_MODEL)
+    # ...and ProjectManagerAgent loaded the same weights again
+    tokenizer = AutoTokenizer.from_pretrained(LLM_MODEL)
+    model = AutoModelForCausalLM.from_pretrained(LLM_MODEL)
+    pm_pipeline = pipeline("text-generation", model=model, tokenizer=tokenizer, max_new_tokens=256)
+    return db_manager, (agent_db_manager, agents_pipeline, pm_pipeline)
+
+
+def _make_rerun_after():
+    """Build a rerun function that mimics st.cache_resource around AppContext"""
+    cache = {}
+
+    def rerun():
+        if "context" not in cache:
+            cache["context"] = AppContext()
+        context = cache["context"]
+        return context.db_manager, context.agent_manager
+
+    return rerun
+
+
+def _time_reruns(rerun, reruns):
+    timings = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        rerun()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _report(label, timings):
+    cold, warm = timings[0], timings[1:]
+    warm_median = statistics.median(warm) if warm else float("nan")
+    print(f"{label:<8} cold: {cold * 1000:10.1f} ms   warm (median of {len(warm)}): {warm_median * 1000:10.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--reruns", type=int, default=5, help="Number of simulated script reruns (first one is cold)")
+    args = parser.parse_args()
+
+    # Run in a scratch directory so the benchmark store doesn't touch ./chroma_db
+    workdir = tempfile.mkdtemp(prefix="startup_bench_")
+    os.chdir(workdir)
+
+    print(f"Simulating {args.reruns} Streamlit reruns...\n")
+    before = _time_reruns(_rerun_before, args.reruns)
+    model_registry._registry = None
+    after = _time_reruns(_make_rerun_after(), args.reruns)
+
+    _report("before", before)
+    _report("after", after)
+
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
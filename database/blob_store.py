@@ -0,0 +1,123 @@
+# database/blob_store.py
+"""
+Content-addressed store for full artifact bodies
+
+Bodies are zlib-compressed and filed under the SHA-256 of their text, so an
+artifact that is generated again in a later run (or by another project) takes
+no extra space. Chroma keeps the text it embeds plus the blob reference; the
+full body is read from here only when a caller asks for the content.
+"""
+import hashlib
+import os
+import tempfile
+import zlib
+
+DEFAULT_BLOB_PATH = "./artifact_blobs"
+COMPRESSION_LEVEL = 6
+
+
+class BlobStore:
+    def __init__(self, path=None, compression_level=COMPRESSION_LEVEL):
+        """
+        Open (or create) the blob store
+
+        Args:
+            path (str): Root directory. Defaults to BLOB_STORE_PATH or ./artifact_blobs
+            compression_level (int): zlib level for new blobs
+        """
+        self.path = path or os.environ.get("BLOB_STORE_PATH", DEFAULT_BLOB_PATH)
+        self.compression_level = compression_level
+        os.makedirs(self.path, exist_ok=True)
+
+    @staticmethod
+    def make_ref(content):
+        """SHA-256 of the text; equal to the artifact's content_hash"""
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    def _blob_path(self, ref):
+        # Two-character fan-out keeps directories small
+        return os.path.join(self.path, ref[:2], f"{ref}.z")
+
+    def put(self, content):
+        """
+        Store a body unless an identical one is already there
+
+        Returns:
+            str: Blob reference
+        """
+        ref = self.make_ref(content)
+        path = self._blob_path(ref)
+        if os.path.exists(path):
+            return ref
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so readers never see a partial blob
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(zlib.compress(content.encode("utf-8"), self.compression_level))
+            os.replace(tmp_path, path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return ref
+
+    def get(self, ref):
+        """
+        Load a body
+
+        Raises:
+            KeyError: No blob with this reference
+        """
+        try:
+            with open(self._blob_path(ref), "rb") as f:
+                return zlib.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            raise KeyError(ref)
+
+    def get_many(self, refs):
+        """
+        Load several bodies
+
+        Returns:
+            dict: ref -> content for the references that were found
+        """
+        found = {}
+        for ref in set(refs):
+            try:
+                found[ref] = self.get(ref)
+            except KeyError:
+                pass
+        return found
+
+    def exists(self, ref):
+        return os.path.exists(self._blob_path(ref))
+
+    def delete_unreferenced(self, live_refs):
+        """
+        Remove blobs no artifact points to any more
+
+        Args:
+            live_refs (set): References still in use (across every collection sharing this store)
+
+        Returns:
+            int: Number of blobs removed
+        """
+        removed = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith(".z") and name[:-2] not in live_refs:
+                    os.remove(os.path.join(root, name))
+                    removed += 1
+        return removed
+
+    def stats(self):
+        """Blob count and compressed size on disk"""
+        count = 0
+        size = 0
+        for root, _, files in os.walk(self.path):
+            for name in files:
+                if name.endswith(".z"):
+                    count += 1
+                    size += os.path.getsize(os.path.join(root, name))
+        return {"blobs": count, "bytes": size, "path": self.path}
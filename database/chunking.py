@@ -0,0 +1,116 @@
+# database/chunking.py
+"""
+Split artifacts into retrieval chunks
+
+Python code is split along its syntax tree into one chunk per top-level
+function and class (large classes per method), so each symbol gets its own
+embedding instead of one vector for the whole module. Top-level statements
+outside any definition (imports, constants, the __main__ block) form one
+more "module" chunk. Other long artifacts
+(user stories, raw model output) are split into overlapping text windows.
+"""
+import ast
+
+# Classes longer than this are chunked per method instead of as a whole
+MAX_CLASS_LINES = 80
+
+
+def _node_span(node):
+    """First and last source line of a definition, decorators included"""
+    start = min([node.lineno] + [decorator.lineno for decorator in node.decorator_list])
+    return start, node.end_lineno
+
+
+def chunk_python(code, max_class_lines=MAX_CLASS_LINES):
+    """
+    Split Python source into function- and class-level chunks
+
+    Args:
+        code (str): Module source
+        max_class_lines (int): Classes longer than this become one chunk per method
+
+    Returns:
+        list: Dicts with "symbol", "kind", "start_line", "end_line" and "content";
+            empty when the code does not parse or defines no symbols. Module-level
+            statements come first, as symbol "<module>" of kind "module"
+    """
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+
+    lines = code.splitlines()
+    definitions = (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)
+
+    def make_chunk(node, symbol, kind):
+        start, end = _node_span(node)
+        return {
+            "symbol": symbol,
+            "kind": kind,
+            "start_line": start,
+            "end_line": end,
+            "content": "\n".join(lines[start - 1:end])
+        }
+
+    chunks = []
+    module_nodes = [node for node in tree.body if not isinstance(node, definitions)]
+    if module_nodes and len(module_nodes) < len(tree.body):
+        chunks.append({
+            "symbol": "<module>",
+            "kind": "module",
+            "start_line": module_nodes[0].lineno,
+            "end_line": module_nodes[-1].end_lineno,
+            "content": "\n".join(
+                "\n".join(lines[node.lineno - 1:node.end_lineno]) for node in module_nodes
+            )
+        })
+    for node in tree.body:
+        if isinstance(node, ast.ClassDef):
+            start, end = _node_span(node)
+            methods = [child for child in node.body if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef))]
+            if end - start + 1 > max_class_lines and methods:
+                for method in methods:
+                    chunks.append(make_chunk(method, f"{node.name}.{method.name}", "method"))
+            else:
+                chunks.append(make_chunk(node, node.name, "class"))
+        elif isinstance(node, definitions):
+            chunks.append(make_chunk(node, node.name, "function"))
+
+    # Redefinitions of the same name still need distinct chunk ids
+    seen = {}
+    for chunk in chunks:
+        count = seen.get(chunk["symbol"], 0) + 1
+        seen[chunk["symbol"]] = count
+        if count > 1:
+            chunk["symbol"] = f"{chunk['symbol']}~{count}"
+    return chunks
+
+
+def chunk_text(text, max_chars=1000, overlap=150):
+    """
+    Split long text into overlapping windows that end on natural boundaries
+
+    Args:
+        text (str): Text to split
+        max_chars (int): Upper bound on a window's length
+        overlap (int): Characters repeated at the start of the next window
+
+    Returns:
+        list: Dicts with "start", "end" (character offsets) and "content"
+    """
+    chunks = []
+    start = 0
+    while start < len(text):
+        end = min(start + max_chars, len(text))
+        if end < len(text):
+            # Prefer paragraph, line, sentence, then clause boundaries in the back half
+            for separator in ("\n\n", "\n", ". ", ", ", " "):
+                cut = text.rfind(separator, start + max_chars // 2, end)
+                if cut != -1:
+                    end = cut + len(separator)
+                    break
+        chunks.append({"start": start, "end": end, "content": text[start:end]})
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
@@ -2,9 +2,38 @@
 # database/db_manager.py
 import chromadb
 import os
+import copy
+import difflib
+import hashlib
 import json
+import re
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
 from chromadb.config import Settings
-from chromadb.utils import embedding_functions
+from chromadb.errors import NotFoundError
+
+from .blob_store import BlobStore
+from .chunking import chunk_python, chunk_text
+from .embeddings import LocalEmbeddingFunction
+from .history import ArtifactHistory
+from .keyword_index import BM25Index, reciprocal_rank_fusion
+
+# Metadata type of the chunks stored next to code and long artifacts
+CHUNK_TYPE = "chunk"
+# Suffixes of the collections used while re-indexing (never listed as projects)
+REINDEX_SUFFIX = ".reindex"
+RETIRED_SUFFIX = ".retired"
+# index_config keys -> Chroma HNSW configuration keys; only search_ef can change
+# after a collection has been created
+HNSW_PARAMS = {"space": "space", "construction_ef": "ef_construction", "search_ef": "ef_search", "M": "max_neighbors"}
+SNAPSHOT_FORMAT_VERSION = 1
+# Non-code artifacts longer than this are embedded as several text chunks
+LONG_ARTIFACT_CHARS = 2000
+TEXT_CHUNK_CHARS = 1000
+# Chunked artifacts keep only this much of their body in Chroma; the rest is in the blob store
+PREVIEW_CHARS = 500
 
 class DatabaseManager:
     # def __init__(self, collection_name="project_artifacts"):
@@ -42,57 +71,1000 @@ class DatabaseManager:
     #             name=collection_name,
     #             embedding_function=self.embedding_function
     #         )
-    def __init__(self, collection_name="project_artifacts"):
+    def __init__(self, collection_name="project_artifacts", project_id=None, run_id=None,
+                 max_open_collections=8, query_cache_size=256, index_config=None):
+        """
+        Open the artifact store
+        
+        Args:
+            collection_name (str): Base collection; each project gets its own
+                "<collection_name>__<project_id>" collection
+            project_id (str): Project to scope reads, writes and deletes to (None = shared collection)
+            run_id (str): Run within the project; written into metadata and used as a filter
+            max_open_collections (int): Collection handles kept open (least recently used are dropped)
+            query_cache_size (int): Search/retrieval results kept in memory (0 disables the cache)
+            index_config (dict): HNSW settings for the collections this manager creates:
+                space ("l2", "cosine" or "ip"), construction_ef, search_ef and M
+        """
         self.client = chromadb.PersistentClient(path="./chroma_db")
 
-        self.embedding_function = embedding_functions.HuggingFaceEmbeddingFunction(
+        # Embed on the CPU with a local all-MiniLM-L6-v2 (no inference API round trips),
+        # with vectors cached on disk by content hash
+        self.embedding_function = LocalEmbeddingFunction(
             model_name="sentence-transformers/all-MiniLM-L6-v2"
         )
-
+        # Full artifact bodies, compressed and deduplicated by content hash
+        self.blob_store = BlobStore()
+        # Every content change of an artifact, as delta chains with periodic full copies
+        self.history = ArtifactHistory()
+        
+        self.collection_name = collection_name
+        self.project_id = project_id
+        self.run_id = run_id
+        self.max_open_collections = max_open_collections
+        self.index_config = self._validate_index_config(index_config)
+        # Per-collection overrides registered through scoped(..., index_config=...)
+        self._index_configs = {}
+        # Shared by every scoped view of this manager
+        self._collections = OrderedDict()
+        self._collections_lock = threading.Lock()
+        # BM25 index per collection, built on first keyword search and kept in sync on writes
+        self._keyword_indexes = {}
+        self._keyword_lock = threading.Lock()
+        # Read results keyed by (method, collection, version, run, args); every write
+        # through this manager bumps the collection's version
+        self.query_cache_size = query_cache_size
+        self._versions = {}
+        self._query_cache = OrderedDict()
+        self._query_cache_lock = threading.Lock()
+        self._query_cache_stats = {"hits": 0, "misses": 0, "saved_seconds": 0.0}
+        # Writes are serialized so a re-index can swap collections between them
+        self._write_lock = threading.RLock()
+        self._reindex_jobs = {}
+        self._collection_override = None
+        
+        # Open the default scope eagerly so a broken store fails at startup
+        self._get_collection(self._collection_name_for(self.project_id))
+    
+    @property
+    def collection(self):
+        """Collection handle for the current project scope"""
+        if self._collection_override is not None:
+            return self._collection_override
+        return self._get_collection(self._collection_name_for(self.project_id))
+    
+    def _collection_name_for(self, project_id):
+        """Collection name for a project (Chroma allows [a-zA-Z0-9._-], 3-512 chars)"""
+        if project_id is None:
+            return self.collection_name
+        slug = re.sub(r"[^a-zA-Z0-9._-]+", "-", str(project_id)).strip("-._") or "default"
+        return f"{self.collection_name}__{slug}"
+    
+    def _get_collection(self, name):
+        """Return an open handle for the collection, opening (or creating) it on a miss"""
+        with self._collections_lock:
+            if name in self._collections:
+                self._collections.move_to_end(name)
+                return self._collections[name]
+            
+            try:
+                # ⚠️ Try retrieving the collection with the correct embedding function
+                collection = self.client.get_collection(
+                    name=name,
+                    embedding_function=self.embedding_function
+                )
+                print(f"✅ Collection '{name}' retrieved successfully.")
+                self._apply_index_config(name, collection)
+            
+            except NotFoundError:
+                collection = self.client.create_collection(
+                    name=name,
+                    embedding_function=self.embedding_function,
+                    configuration=self._collection_configuration(name)
+                )
+                print(f"✅ New collection '{name}' created successfully!")
+            
+            except ValueError as e:
+                # 🔥 Embedding function mismatch: keep serving the existing collection and
+                # rebuild it with the current embedding function in the background
+                print(f"⚠️ Error: {str(e)}")
+                print(f"🛠️ Re-indexing collection '{name}' in the background...")
+                
+                collection = self.client.get_collection(name=name, embedding_function=None)
+                self._collections[name] = collection
+                self._start_reindex(name, collection)
+            
+            self._collections[name] = collection
+            while len(self._collections) > self.max_open_collections:
+                self._collections.popitem(last=False)
+            return collection
+    
+    @staticmethod
+    def _validate_index_config(index_config):
+        """Check index_config keys and values; returns a copy (or None)"""
+        if not index_config:
+            return None
+        unknown = set(index_config) - set(HNSW_PARAMS)
+        if unknown:
+            raise ValueError(f"Unknown index_config keys: {sorted(unknown)} (expected {sorted(HNSW_PARAMS)})")
+        if "space" in index_config and index_config["space"] not in ("l2", "cosine", "ip"):
+            raise ValueError(f"Unsupported space: {index_config['space']}")
+        for key in ("construction_ef", "search_ef", "M"):
+            if key in index_config and int(index_config[key]) < 1:
+                raise ValueError(f"{key} must be a positive integer")
+        return dict(index_config)
+    
+    def _collection_configuration(self, name):
+        """Chroma configuration for creating a collection (None = Chroma defaults)"""
+        index_config = self._index_configs.get(name, self.index_config)
+        if not index_config:
+            return None
+        return {"hnsw": {HNSW_PARAMS[key]: value for key, value in index_config.items()}}
+    
+    def _apply_index_config(self, name, collection):
+        """Bring an existing collection in line with its index_config where Chroma allows it"""
+        index_config = self._index_configs.get(name, self.index_config)
+        if not index_config:
+            return
+        current = (collection.configuration or {}).get("hnsw") or {}
+        if "search_ef" in index_config and current.get("ef_search") != index_config["search_ef"]:
+            collection.modify(configuration={"hnsw": {"ef_search": index_config["search_ef"]}})
+        fixed = [key for key in ("space", "construction_ef", "M")
+                 if key in index_config and current.get(HNSW_PARAMS[key]) != index_config[key]]
+        if fixed:
+            print(f"⚠️ Collection '{name}' was built with different {', '.join(fixed)}; "
+                  f"call reindex() to rebuild it with the new index settings")
+    
+    def index_config_for(self, project_id=None):
+        """
+        HNSW settings of a project's collection as Chroma reports them
+        
+        Returns:
+            dict: space, construction_ef, search_ef and M
+        """
+        project_id = project_id if project_id is not None else self.project_id
+        current = (self._get_collection(self._collection_name_for(project_id)).configuration or {}).get("hnsw") or {}
+        return {key: current.get(chroma_key) for key, chroma_key in HNSW_PARAMS.items()}
+    
+    def reindex(self, project_id=None, wait=False):
+        """
+        Rebuild a project's collection with the current embedding function
+        
+        Runs in the background; reads keep using the current collection until
+        the rebuilt one is swapped in. See reindex_status() for progress.
+        
+        Args:
+            project_id (str): Project to re-index (defaults to the current project)
+            wait (bool): Block until the re-index has finished
+            
+        Returns:
+            dict: Status of the re-index job
+        """
+        project_id = project_id if project_id is not None else self.project_id
+        name = self._collection_name_for(project_id)
+        collection = self._get_collection(name)
+        with self._collections_lock:
+            job = self._start_reindex(name, collection)
+        if wait:
+            job["thread"].join()
+        return self.reindex_status(name)
+    
+    def reindex_status(self, name=None):
+        """
+        Progress of background re-index jobs
+        
+        Args:
+            name (str): Collection name (None = all jobs)
+            
+        Returns:
+            dict: state ("running", "done" or "failed"), done, total, progress,
+                elapsed seconds and error; keyed by collection when name is None
+        """
+        def describe(job):
+            status = {key: value for key, value in job.items() if key != "thread"}
+            status["progress"] = status["done"] / status["total"] if status["total"] else 0.0
+            status["elapsed"] = (status["finished_at"] or time.time()) - status["started_at"]
+            return status
+        if name is not None:
+            return describe(self._reindex_jobs[name]) if name in self._reindex_jobs else None
+        return {job_name: describe(job) for job_name, job in list(self._reindex_jobs.items())}
+    
+    def _start_reindex(self, name, collection):
+        """Start a background re-index of a collection unless one is already running"""
+        job = self._reindex_jobs.get(name)
+        if job is not None and job["state"] == "running":
+            return job
+        job = {"state": "running", "done": 0, "total": collection.count(), "error": None,
+               "started_at": time.time(), "finished_at": None}
+        job["thread"] = threading.Thread(
+            target=self._reindex_worker, args=(name, collection, job), name=f"reindex-{name}", daemon=True
+        )
+        self._reindex_jobs[name] = job
+        job["thread"].start()
+        return job
+    
+    def _reindex_worker(self, name, old_collection, job, page_size=100):
+        """
+        Copy every artifact into a shadow collection, then swap it in
+        
+        The shadow is filled through store_artifacts, so chunks and content hashes
+        are rebuilt and an interrupted run resumes where it stopped. Writes made
+        meanwhile go to the old collection and are picked up by a final catch-up
+        pass that runs under the write lock, right before the swap.
+        """
+        shadow_name = f"{name}{REINDEX_SUFFIX}"
         try:
-            # ⚠️ Try retrieving the collection with the correct embedding function
-            self.collection = self.client.get_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
-            )
-            print(f"✅ Collection '{collection_name}' retrieved successfully.")
-
-        except ValueError as e:
-            # 🔥 If there's an embedding function mismatch, delete & recreate the collection
-            print(f"⚠️ Error: {str(e)}")
-            print(f"🛠️ Deleting and recreating collection '{collection_name}'...")
-
-            self.client.delete_collection(name=collection_name)  # Delete the old one
-
-            self.collection = self.client.create_collection(
-                name=collection_name,
-                embedding_function=self.embedding_function
-            )
-
-            print(f"✅ New collection '{collection_name}' created successfully!")
+            try:
+                shadow = self.client.get_or_create_collection(
+                    name=shadow_name,
+                    embedding_function=self.embedding_function,
+                    configuration=self._collection_configuration(name)
+                )
+            except ValueError:
+                # Leftover from a re-index with yet another embedding function
+                self.client.delete_collection(name=shadow_name)
+                shadow = self.client.create_collection(
+                    name=shadow_name,
+                    embedding_function=self.embedding_function,
+                    configuration=self._collection_configuration(name)
+                )
+            
+            # Writes into the shadow go through a private view of this manager
+            shadow_view = copy.copy(self)
+            shadow_view._collection_override = shadow
+            shadow_view.run_id = None
+            shadow_view.query_cache_size = 0
+            
+            def copy_pass(track_progress):
+                artifact_ids = set()
+                offset = 0
+                while True:
+                    page = old_collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+                    artifacts = [
+                        {"id": artifact_id, "content": document or "", "metadata": metadata or {}}
+                        for artifact_id, document, metadata in zip(page["ids"], page["documents"], page["metadatas"])
+                        if not (metadata or {}).get("parent_id")  # chunks are rebuilt from their artifact
+                    ]
+                    batch = []
+                    for artifact in self._load_bodies(artifacts):
+                        metadata = dict(artifact["metadata"])
+                        for key in ("content_hash", "chunk_count", "blob_ref"):
+                            metadata.pop(key, None)
+                        artifact_ids.add(artifact["id"])
+                        batch.append({"id": artifact["id"], "content": artifact["content"], "metadata": metadata})
+                    if batch:
+                        report = shadow_view.store_artifacts(batch)
+                        if report["failed"]:
+                            raise RuntimeError(f"Re-index failed for {sorted(report['failed'])[:5]}")
+                    if track_progress:
+                        job["done"] += len(page["ids"])
+                    offset += len(page["ids"])
+                    if len(page["ids"]) < page_size:
+                        return artifact_ids
+            
+            copy_pass(track_progress=True)
+            
+            with self._write_lock:
+                # Catch up with writes made during the copy (unchanged artifacts are skipped)
+                artifact_ids = copy_pass(track_progress=False)
+                removed = [artifact_id for artifact_id in
+                           shadow.get(where={"type": {"$ne": CHUNK_TYPE}}, include=[])["ids"]
+                           if artifact_id not in artifact_ids]
+                if removed:
+                    shadow_view.delete_artifacts(removed)
+                
+                with self._collections_lock:
+                    old_collection.modify(name=f"{name}{RETIRED_SUFFIX}")
+                    shadow.modify(name=name)
+                    self._collections[name] = shadow
+                with self._keyword_lock:
+                    self._keyword_indexes.pop(name, None)
+                with self._query_cache_lock:
+                    self._versions[name] = self._versions.get(name, 0) + 1
+            
+            self.client.delete_collection(name=f"{name}{RETIRED_SUFFIX}")
+            job["done"] = job["total"]
+            job["state"] = "done"
+            print(f"✅ Collection '{name}' re-indexed with the current embedding function")
+        except Exception as e:
+            # The old collection keeps serving; the shadow is reused by the next attempt
+            job["state"] = "failed"
+            job["error"] = str(e)
+            print(f"❌ Re-indexing '{name}' failed: {str(e)}")
+        finally:
+            job["finished_at"] = time.time()
+    
+    def scoped(self, project_id, run_id=None, index_config=None):
+        """
+        View of this store limited to one project (and optionally one run)
+        
+        The view shares the client, embedding function and open collection handles.
+        Within a run, artifacts are addressed by their own ids but stored under
+        "<run_id>/<id>", so runs of the same project never overwrite each other.
+        
+        Args:
+            project_id (str): Project whose collection to use
+            run_id (str): Run to tag writes with and filter reads by
+            index_config (dict): HNSW settings for this project's collection (see __init__)
+            
+        Returns:
+            DatabaseManager: The scoped view
+        """
+        if index_config is not None:
+            name = self._collection_name_for(project_id)
+            self._index_configs[name] = self._validate_index_config(index_config)
+            with self._collections_lock:
+                collection = self._collections.get(name)
+            if collection is not None:
+                self._apply_index_config(name, collection)
+        view = copy.copy(self)
+        view.project_id = project_id
+        view.run_id = run_id
+        return view
+    
+    def _scoped_where(self, where=None):
+        """Combine a metadata filter with the current run filter"""
+        if self.run_id is None:
+            return where
+        run_filter = {"run_id": self.run_id}
+        if not where:
+            return run_filter
+        return {"$and": [where, run_filter]}
+    
+    def _row_id(self, artifact_id):
+        """Chroma id of an artifact: runs of a project keep their own rows ("<run_id>/<id>")"""
+        if self.run_id is None:
+            return artifact_id
+        return f"{self.run_id}/{artifact_id}"
+    
+    def _artifact_id(self, row_id):
+        """Inverse of _row_id for rows of the current run"""
+        prefix = f"{self.run_id}/"
+        if self.run_id is not None and row_id.startswith(prefix):
+            return row_id[len(prefix):]
+        return row_id
+    
+    def _bump_version(self):
+        """Invalidate cached reads of the current collection"""
+        name = self._collection_name_for(self.project_id)
+        with self._query_cache_lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+    
+    def _cached_read(self, method, args, compute):
+        """
+        Serve a read from the query cache, or compute and remember it
+        
+        Writes made by other processes are not seen until this process writes
+        to the same collection.
+        """
+        if not self.query_cache_size:
+            return compute()
+        name = self._collection_name_for(self.project_id)
+        with self._query_cache_lock:
+            key = (method, name, self._versions.get(name, 0), self.run_id, repr(args))
+            entry = self._query_cache.get(key)
+            if entry is not None:
+                self._query_cache.move_to_end(key)
+                self._query_cache_stats["hits"] += 1
+                self._query_cache_stats["saved_seconds"] += entry[1]
+                return copy.deepcopy(entry[0])
+            self._query_cache_stats["misses"] += 1
+        
+        start = time.perf_counter()
+        result = compute()
+        elapsed = time.perf_counter() - start
+        
+        with self._query_cache_lock:
+            self._query_cache[key] = (copy.deepcopy(result), elapsed)
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return result
+    
+    def query_cache_stats(self):
+        """
+        Query cache counters
+        
+        Returns:
+            dict: entries, hits, misses, hit_rate and saved_seconds (read latency avoided by hits)
+        """
+        with self._query_cache_lock:
+            stats = dict(self._query_cache_stats)
+            stats["entries"] = len(self._query_cache)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+    
+    def list_projects(self):
+        """
+        List projects that have their own collection
+        
+        Returns:
+            list: Project collection suffixes
+        """
+        prefix = f"{self.collection_name}__"
+        names = [col if isinstance(col, str) else col.name for col in self.client.list_collections()]
+        return sorted(
+            name[len(prefix):] for name in names
+            if name.startswith(prefix) and not name.endswith((REINDEX_SUFFIX, RETIRED_SUFFIX))
+        )
+    
+    def delete_artifacts(self, artifact_ids=None, where=None):
+        """
+        Delete artifacts from the current scope
+        
+        An artifact's version history is dropped once no run of the project still
+        has a row for it, so an artifact created later under the same id starts
+        again at version 1.
+        
+        Args:
+            artifact_ids (list): Ids to delete (optional)
+            where (dict): Metadata filter (optional); the run filter is always applied
+            
+        Returns:
+            int: Number of artifacts deleted
+        """
+        where = self._scoped_where(where)
+        if artifact_ids is None and where is None:
+            raise ValueError("Pass artifact_ids or where; use delete_project() to drop a whole project")
+        if artifact_ids is not None:
+            artifact_ids = [self._row_id(artifact_id) for artifact_id in artifact_ids]
+        result = self.collection.get(ids=artifact_ids, where=where, include=["metadatas"])
+        matched = result["ids"]
+        if matched:
+            # Chunks go with the artifacts they belong to
+            chunks = self.collection.get(where={"parent_id": {"$in": matched}}, include=[])["ids"]
+            self._delete_rows(matched + [chunk_id for chunk_id in chunks if chunk_id not in matched])
+            logical_ids = {(metadata or {}).get("artifact_id", row_id)
+                           for row_id, metadata in zip(matched, result["metadatas"])
+                           if "parent_id" not in (metadata or {})}
+            self._forget_history(logical_ids)
+        return len(matched)
+    
+    def _forget_history(self, logical_ids):
+        """Drop the version history of artifacts that no run of the project holds any more"""
+        logical_ids = list(logical_ids)
+        if not logical_ids:
+            return
+        remaining = self.collection.get(where={"artifact_id": {"$in": logical_ids}}, include=["metadatas"])
+        still_stored = {metadata["artifact_id"] for metadata in remaining["metadatas"]
+                        if "parent_id" not in metadata}
+        # Rows written before artifact_id was recorded are keyed by the bare id
+        still_stored.update(self.collection.get(ids=logical_ids, include=[])["ids"])
+        orphaned = [artifact_id for artifact_id in logical_ids if artifact_id not in still_stored]
+        if orphaned:
+            self.history.delete(self._collection_name_for(self.project_id), orphaned)
+    
+    def _delete_rows(self, row_ids):
+        """Delete rows from the collection and the keyword index"""
+        if not row_ids:
+            return
+        with self._write_lock:
+            self.collection.delete(ids=row_ids)
+        self._bump_version()
+        index = self._keyword_indexes.get(self._collection_name_for(self.project_id))
+        if index is not None:
+            for row_id in row_ids:
+                index.remove(row_id)
+    
+    def _keyword_index(self):
+        """BM25 index for the current collection, built from its documents on first use"""
+        name = self._collection_name_for(self.project_id)
+        with self._keyword_lock:
+            index = self._keyword_indexes.get(name)
+            if index is None:
+                index = BM25Index()
+                collection = self.collection
+                offset = 0
+                while True:
+                    page = collection.get(include=["documents"], limit=500, offset=offset)
+                    index.add_many(zip(page["ids"], page["documents"]))
+                    if len(page["ids"]) < 500:
+                        break
+                    offset += 500
+                self._keyword_indexes[name] = index
+            return index
+    
+    def _index_documents(self, docs):
+        """Keep an already built keyword index in sync with written documents"""
+        index = self._keyword_indexes.get(self._collection_name_for(self.project_id))
+        if index is not None:
+            index.add_many(docs)
+    
+    def delete_project(self, project_id=None):
+        """
+        Drop a project's collection (defaults to the current project)
+        
+        Args:
+            project_id (str): Project to delete
+        """
+        project_id = project_id if project_id is not None else self.project_id
+        if project_id is None:
+            raise ValueError("The shared collection cannot be deleted as a project")
+        name = self._collection_name_for(project_id)
+        with self._collections_lock:
+            self._collections.pop(name, None)
+        with self._keyword_lock:
+            self._keyword_indexes.pop(name, None)
+        with self._query_cache_lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+        try:
+            self.client.delete_collection(name=name)
+        except NotFoundError:
+            pass
+        self.history.delete(name)
+    
+    def collect_blobs(self):
+        """
+        Delete blob store bodies that no artifact in any collection refers to
+        
+        Returns:
+            int: Number of blobs removed
+        """
+        live_refs = set()
+        with self._write_lock:
+            for col in self.client.list_collections():
+                collection = self.client.get_collection(
+                    name=col if isinstance(col, str) else col.name, embedding_function=None
+                )
+                offset = 0
+                while True:
+                    page = collection.get(include=["metadatas"], limit=500, offset=offset)
+                    live_refs.update((metadata or {}).get("blob_ref") for metadata in page["metadatas"])
+                    if len(page["ids"]) < 500:
+                        break
+                    offset += 500
+            removed = self.blob_store.delete_unreferenced(live_refs)
+        print(f"✅ Removed {removed} unreferenced blobs")
+        return removed
     
     # Rest of the methods remain the same
+    def export_snapshot(self, path, page_size=500):
+        """
+        Write the current collection to a compressed .npz snapshot
+        
+        Ids, documents and metadata are stored as UTF-8 columns (one byte buffer
+        plus offsets each) and the vectors as a float32 matrix, so the snapshot
+        loads without pickle and without re-embedding. Chunks are included, and
+        so are the blob store bodies the rows point to.
+        
+        Args:
+            path (str): Target file (".npz" is appended by numpy if missing)
+            page_size (int): Rows read from Chroma per round trip
+            
+        Returns:
+            int: Number of rows written
+        """
+        ids, documents, metadatas, vectors = [], [], [], []
+        with self._write_lock:
+            collection = self.collection
+            offset = 0
+            while True:
+                page = collection.get(include=["documents", "metadatas", "embeddings"], limit=page_size, offset=offset)
+                ids.extend(page["ids"])
+                documents.extend(document or "" for document in page["documents"])
+                metadatas.extend(page["metadatas"] or [None] * len(page["ids"]))
+                vectors.extend(page["embeddings"] if page["embeddings"] is not None else [])
+                offset += len(page["ids"])
+                if len(page["ids"]) < page_size:
+                    break
+        
+        header = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "collection": collection.name,
+            "embedding_function": self.embedding_function.name(),
+            "embedding_model": getattr(self.embedding_function, "model_name", None),
+            "index_config": self.index_config_for(),
+            "count": len(ids),
+            "created_at": time.time()
+        }
+        embeddings = np.asarray(vectors, dtype=np.float32) if vectors else np.zeros((0, 0), dtype=np.float32)
+        ids_data, ids_offsets = self._encode_column(ids)
+        documents_data, documents_offsets = self._encode_column(documents)
+        metadatas_data, metadatas_offsets = self._encode_column(json.dumps(metadata) for metadata in metadatas)
+        refs = sorted({metadata["blob_ref"] for metadata in metadatas if metadata and metadata.get("blob_ref")})
+        bodies = self.blob_store.get_many(refs)
+        refs = [ref for ref in refs if ref in bodies]
+        blob_refs_data, blob_refs_offsets = self._encode_column(refs)
+        blobs_data, blobs_offsets = self._encode_column(bodies[ref] for ref in refs)
+        np.savez_compressed(
+            path,
+            header=np.frombuffer(json.dumps(header).encode("utf-8"), dtype=np.uint8),
+            embeddings=embeddings,
+            ids_data=ids_data, ids_offsets=ids_offsets,
+            documents_data=documents_data, documents_offsets=documents_offsets,
+            metadatas_data=metadatas_data, metadatas_offsets=metadatas_offsets,
+            blob_refs_data=blob_refs_data, blob_refs_offsets=blob_refs_offsets,
+            blobs_data=blobs_data, blobs_offsets=blobs_offsets
+        )
+        print(f"✅ Exported {len(ids)} rows from '{collection.name}' to {path}")
+        return len(ids)
+    
+    def import_snapshot(self, path, replace=False):
+        """
+        Bulk-load a snapshot written by export_snapshot into the current collection
+        
+        Vectors are written as stored; the embedding function is never called.
+        In a run-scoped view every row is moved into that run (its id and run_id
+        are rewritten), so the view's reads see what it imported.
+        
+        Args:
+            path (str): Snapshot file
+            replace (bool): Delete everything in the collection before loading
+            
+        Returns:
+            int: Number of rows loaded
+        """
+        with np.load(path, allow_pickle=False) as snapshot:
+            header = json.loads(snapshot["header"].tobytes().decode("utf-8"))
+            if header.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+                raise ValueError(f"Unsupported snapshot format: {header.get('format_version')}")
+            model = getattr(self.embedding_function, "model_name", None)
+            if (header.get("embedding_function"), header.get("embedding_model")) != (self.embedding_function.name(), model):
+                raise ValueError(
+                    f"Snapshot vectors come from {header.get('embedding_function')}/{header.get('embedding_model')}, "
+                    f"this store embeds with {self.embedding_function.name()}/{model}"
+                )
+            embeddings = snapshot["embeddings"]
+            ids = self._decode_column(snapshot["ids_data"], snapshot["ids_offsets"])
+            documents = self._decode_column(snapshot["documents_data"], snapshot["documents_offsets"])
+            metadatas = [json.loads(metadata) for metadata in
+                         self._decode_column(snapshot["metadatas_data"], snapshot["metadatas_offsets"])]
+            if self.run_id is not None:
+                # Rows move into this view's run: "<old run>/<id>" becomes "<run>/<id>"
+                def into_run(row_id, old_run):
+                    if old_run and row_id.startswith(f"{old_run}/"):
+                        row_id = row_id[len(old_run) + 1:]
+                    return self._row_id(row_id)
+                
+                for position, metadata in enumerate(metadatas):
+                    metadata = dict(metadata or {})
+                    old_run = metadata.get("run_id")
+                    ids[position] = into_run(ids[position], old_run)
+                    if metadata.get("parent_id"):
+                        metadata["parent_id"] = into_run(metadata["parent_id"], old_run)
+                    metadata["run_id"] = self.run_id
+                    metadatas[position] = metadata
+            blobs = []
+            if "blobs_data" in snapshot.files:
+                blobs = self._decode_column(snapshot["blobs_data"], snapshot["blobs_offsets"])
+        
+        # Bodies first, so no imported row points to a missing blob
+        for body in blobs:
+            self.blob_store.put(body)
+        
+        with self._write_lock:
+            collection = self.collection
+            if replace:
+                existing = collection.get(include=[])["ids"]
+                max_batch = self.client.get_max_batch_size()
+                for start in range(0, len(existing), max_batch):
+                    collection.delete(ids=existing[start:start + max_batch])
+            max_batch = self.client.get_max_batch_size()
+            for start in range(0, len(ids), max_batch):
+                collection.upsert(
+                    ids=ids[start:start + max_batch],
+                    documents=documents[start:start + max_batch],
+                    metadatas=[metadata or None for metadata in metadatas[start:start + max_batch]],
+                    embeddings=embeddings[start:start + max_batch]
+                )
+            with self._keyword_lock:
+                self._keyword_indexes.pop(collection.name, None)
+            self._bump_version()
+        
+        print(f"✅ Imported {len(ids)} rows from {path} into '{collection.name}'")
+        return len(ids)
+    
+    @staticmethod
+    def _encode_column(values):
+        """Strings -> (UTF-8 byte buffer, end offsets)"""
+        encoded = [value.encode("utf-8") for value in values]
+        offsets = np.cumsum([len(value) for value in encoded], dtype=np.int64)
+        return np.frombuffer(b"".join(encoded), dtype=np.uint8), offsets
+    
+    @staticmethod
+    def _decode_column(data, offsets):
+        """Inverse of _encode_column"""
+        buffer = data.tobytes()
+        starts = np.concatenate(([0], offsets[:-1])) if len(offsets) else []
+        return [buffer[start:end].decode("utf-8") for start, end in zip(starts, offsets)]
+    
     def store_artifact(self, artifact_id, content, metadata=None):
         """
         Store an artifact in the database
         
+        Storing the same id again replaces the artifact; identical content is
+        not re-embedded or rewritten.
+        
         Args:
             artifact_id (str): Unique identifier for the artifact
             content (str): Content of the artifact
             metadata (dict): Metadata for the artifact
         """
-        if metadata is None:
-            metadata = {}
-        
-        # Add document to ChromaDB
-        self.collection.add(
-            documents=[content],
-            metadatas=[metadata],
-            ids=[artifact_id]
-        )
+        report = self.store_artifacts([{"id": artifact_id, "content": content, "metadata": metadata}])
+        if artifact_id in report["failed"]:
+            raise RuntimeError(f"Failed to store {artifact_id}: {report['failed'][artifact_id]}")
         
         return artifact_id
     
+    @staticmethod
+    def content_hash(content):
+        """SHA-256 of the artifact content, kept in its metadata as content_hash"""
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+    
+    def store_artifacts(self, batch, max_retries=3, embed_batch_size=64):
+        """
+        Store several artifacts with batched embeddings and a single write
+        
+        Writes are upserts keyed by id. Artifacts whose content hash and metadata
+        match what is stored are skipped; when only the metadata changed it is
+        updated without re-embedding. Python code is also stored as one chunk per
+        function/class (see _split_artifact); only chunks whose content changed
+        are re-embedded, and the artifact's own vector is the mean of its chunks.
+        The full body of a chunked artifact is kept in the blob store, with only a
+        preview in Chroma; reads return the full body.
+        
+        Args:
+            batch (list): Dicts with "id", "content" and optional "metadata"
+            max_retries (int): Attempts per embedding batch and for the write
+            embed_batch_size (int): Documents sent to the embedding function per call
+            
+        Returns:
+            dict: {"stored": [ids], "unchanged": [ids], "failed": {id: error message}}
+        """
+        with self._write_lock:
+            return self._store_artifacts(batch, max_retries, embed_batch_size)
+    
+    def _store_artifacts(self, batch, max_retries, embed_batch_size):
+        """Body of store_artifacts; runs under the write lock"""
+        stored = []
+        unchanged = []
+        failed = {}
+        
+        # Validate up front so one bad entry cannot sink the whole write
+        ids, documents, metadatas = [], [], []
+        for artifact in batch:
+            artifact_id = artifact.get("id")
+            content = artifact.get("content")
+            if not artifact_id:
+                failed[str(artifact_id)] = "missing artifact id"
+                continue
+            if not isinstance(content, str):
+                failed[artifact_id] = f"content must be a string, got {type(content).__name__}"
+                continue
+            metadata = dict(artifact.get("metadata") or {})
+            metadata["content_hash"] = self.content_hash(content)
+            metadata["blob_ref"] = metadata["content_hash"]
+            # Kept across runs (and re-indexing, which copies rows by their full id)
+            metadata.setdefault("artifact_id", artifact_id)
+            artifact_id = self._row_id(artifact_id)
+            if self.run_id is not None:
+                metadata["run_id"] = self.run_id
+            if artifact_id in ids:
+                # Same id twice in one batch: the later entry wins, as with separate writes
+                position = ids.index(artifact_id)
+                documents[position] = content
+                metadatas[position] = metadata
+                continue
+            ids.append(artifact_id)
+            documents.append(content)
+            metadatas.append(metadata)
+        
+        if not ids:
+            return {"stored": stored, "unchanged": unchanged, "failed": failed}
+        
+        # Chunk rows are appended after the artifacts they belong to
+        n_artifacts = len(ids)
+        chunk_rows = {}  # artifact row -> its chunk rows
+        parent_row = {}  # chunk row -> artifact row
+        for i in range(n_artifacts):
+            chunks = self._split_artifact(ids[i], documents[i], metadatas[i])
+            if not chunks:
+                continue
+            metadatas[i]["chunk_count"] = len(chunks)
+            chunk_rows[i] = []
+            for chunk_id, chunk_content, chunk_metadata in chunks:
+                chunk_metadata["content_hash"] = self.content_hash(chunk_content)
+                if self.run_id is not None:
+                    chunk_metadata["run_id"] = self.run_id
+                chunk_rows[i].append(len(ids))
+                parent_row[len(ids)] = i
+                ids.append(chunk_id)
+                documents.append(chunk_content)
+                metadatas.append(chunk_metadata)
+        
+        # The full body of a chunked artifact lives in the blob store; Chroma keeps
+        # its chunks (the embedded text) and a preview
+        bodies = {i: documents[i] for i in range(n_artifacts)}
+        for i in chunk_rows:
+            documents[i] = documents[i][:PREVIEW_CHARS]
+        
+        max_batch = self.client.get_max_batch_size()
+        
+        # Compare against what is already stored
+        existing = {}
+        for start in range(0, len(ids), max_batch):
+            result = self.collection.get(ids=ids[start:start + max_batch], include=["metadatas"])
+            for artifact_id, metadata in zip(result["ids"], result["metadatas"] or []):
+                existing[artifact_id] = metadata or {}
+        
+        to_embed = []
+        metadata_only = []
+        for i, artifact_id in enumerate(ids):
+            current = existing.get(artifact_id)
+            if current is None or current.get("content_hash") != metadatas[i]["content_hash"]:
+                to_embed.append(i)
+            elif current != metadatas[i]:
+                metadata_only.append(i)
+            elif i < n_artifacts:
+                unchanged.append(artifact_id)
+        
+        # A write replaces the row's metadata, but Chroma merges it into what is
+        # stored: keys the new metadata no longer has are removed explicitly
+        written_metadatas = {
+            i: dict(metadatas[i], **{key: None for key in existing.get(ids[i], {}) if key not in metadatas[i]})
+            for i in to_embed + metadata_only
+        }
+        
+        # Bodies are written before the rows that point to them
+        for i in to_embed + metadata_only:
+            if i < n_artifacts:
+                try:
+                    self.blob_store.put(bodies[i])
+                except Exception as e:
+                    failed[ids[i]] = f"blob write failed: {str(e)}"
+        metadata_only = [i for i in metadata_only if ids[parent_row.get(i, i)] not in failed]
+        
+        if metadata_only:
+            try:
+                self._with_retries(lambda: self.collection.update(
+                    ids=[ids[i] for i in metadata_only],
+                    metadatas=[written_metadatas[i] for i in metadata_only]
+                ), max_retries)
+                stored.extend(ids[i] for i in metadata_only if i < n_artifacts)
+            except Exception as e:
+                for i in metadata_only:
+                    failed[ids[parent_row.get(i, i)]] = f"metadata update failed: {str(e)}"
+        
+        # A chunked artifact's vector is derived from all of its chunks; chunks
+        # that did not change are answered by the embedding cache
+        rows_to_embed = set()
+        for i in to_embed:
+            if ids[parent_row.get(i, i)] not in failed:
+                rows_to_embed.update(chunk_rows.get(i, [i]))
+        rows_to_embed = sorted(rows_to_embed)
+        
+        # Embed in chunks; a chunk that keeps failing is retried document by
+        # document so only the offending ids are reported
+        embeddings = {}
+        for start in range(0, len(rows_to_embed), embed_batch_size):
+            chunk = rows_to_embed[start:start + embed_batch_size]
+            try:
+                vectors = self._with_retries(
+                    lambda: self.embedding_function([documents[i] for i in chunk]), max_retries
+                )
+                embeddings.update(zip(chunk, vectors))
+            except Exception as e:
+                print(f"⚠️ Batch embedding failed ({str(e)}), embedding documents one at a time")
+                for i in chunk:
+                    try:
+                        embeddings[i] = list(self.embedding_function([documents[i]]))[0]
+                    except Exception as doc_error:
+                        failed[ids[parent_row.get(i, i)]] = f"embedding failed: {str(doc_error)}"
+        
+        for i, rows in chunk_rows.items():
+            if i in to_embed and ids[i] not in failed:
+                mean = np.mean([np.asarray(embeddings[row], dtype=np.float32) for row in rows], axis=0)
+                embeddings[i] = mean / (np.linalg.norm(mean) or 1.0)
+        
+        keep = [i for i in to_embed if i in embeddings and ids[parent_row.get(i, i)] not in failed]
+        for start in range(0, len(keep), max_batch):
+            rows = keep[start:start + max_batch]
+            try:
+                self._with_retries(lambda: self.collection.upsert(
+                    ids=[ids[i] for i in rows],
+                    documents=[documents[i] for i in rows],
+                    metadatas=[written_metadatas[i] for i in rows],
+                    embeddings=[embeddings[i] for i in rows]
+                ), max_retries)
+                stored.extend(ids[i] for i in rows if i < n_artifacts)
+                self._index_documents([(ids[i], documents[i]) for i in rows])
+            except Exception as e:
+                for i in rows:
+                    failed[ids[parent_row.get(i, i)]] = f"write failed: {str(e)}"
+        
+        if metadata_only or keep:
+            self._bump_version()
+        
+        # New content becomes a new version; the history is best effort and never fails the write
+        changed = [i for i in keep if i < n_artifacts]
+        if changed:
+            try:
+                self.history.record_many(
+                    self._collection_name_for(self.project_id),
+                    [(metadatas[i]["artifact_id"], bodies[i], metadatas[i]["content_hash"]) for i in changed],
+                    run_id=self.run_id
+                )
+            except Exception as e:
+                print(f"⚠️ Failed to record artifact history: {str(e)}")
+        
+        # Drop chunks of symbols that no longer exist in the stored artifacts
+        written = [ids[i] for i in range(n_artifacts) if ids[i] in stored]
+        if written:
+            current_chunks = set(ids[n_artifacts:])
+            old_chunks = self.collection.get(where={"parent_id": {"$in": written}}, include=[])["ids"]
+            self._delete_rows([chunk_id for chunk_id in old_chunks if chunk_id not in current_chunks])
+        
+        print(f"✅ Stored {len(stored)} artifacts in ChromaDB ({len(unchanged)} unchanged, {len(failed)} failed)")
+        return {
+            "stored": [self._artifact_id(row_id) for row_id in stored],
+            "unchanged": [self._artifact_id(row_id) for row_id in unchanged],
+            "failed": {self._artifact_id(row_id): error for row_id, error in failed.items()}
+        }
+    
+    def _split_artifact(self, artifact_id, content, metadata):
+        """
+        Chunk records stored alongside an artifact
+        
+        Python code is split into function/class chunks. Other artifacts longer
+        than LONG_ARTIFACT_CHARS (and code that does not parse) are split into
+        overlapping text windows. The full artifact is always stored as well.
+        
+        Returns:
+            list: (chunk id, content, metadata) tuples; chunk ids are
+                "<artifact id>#<symbol>" or "<artifact id>#part<n>"
+        """
+        pieces = []
+        if metadata.get("type") == "code" or metadata.get("language") == "python":
+            pieces = chunk_python(content)
+        if len(pieces) < 2:
+            if len(content) <= LONG_ARTIFACT_CHARS:
+                return []
+            return [
+                (
+                    f"{artifact_id}#part{n}",
+                    piece["content"],
+                    {
+                        "type": CHUNK_TYPE,
+                        "parent_id": artifact_id,
+                        "parent_type": str(metadata.get("type", "")),
+                        "kind": "text",
+                        "part": n,
+                        "start_char": piece["start"],
+                        "end_char": piece["end"]
+                    }
+                )
+                for n, piece in enumerate(chunk_text(content, max_chars=TEXT_CHUNK_CHARS), start=1)
+            ]
+        return [
+            (
+                f"{artifact_id}#{piece['symbol']}",
+                piece["content"],
+                {
+                    "type": CHUNK_TYPE,
+                    "parent_id": artifact_id,
+                    "parent_type": str(metadata.get("type", "")),
+                    "symbol": piece["symbol"],
+                    "kind": piece["kind"],
+                    "start_line": piece["start_line"],
+                    "end_line": piece["end_line"]
+                }
+            )
+            for piece in pieces
+        ]
+    
+    @staticmethod
+    def _with_retries(operation, max_retries):
+        """Run operation, retrying with exponential backoff (1, 2, 4... seconds)"""
+        for attempt in range(max_retries):
+            try:
+                return operation()
+            except Exception as e:
+                if attempt == max_retries - 1:
+                    raise
+                wait_time = 2 ** attempt
+                print(f"⚠️ ChromaDB operation failed (attempt {attempt+1}/{max_retries}): {str(e)}. Retrying in {wait_time}s...")
+                time.sleep(wait_time)
+    
     def retrieve_artifact(self, artifact_id):
         """
         Retrieve an artifact by ID
@@ -103,67 +1075,276 @@ class DatabaseManager:
         Returns:
             dict: The retrieved artifact
         """
-        result = self.collection.get(ids=[artifact_id])
+        result = self.collection.get(ids=[self._row_id(artifact_id)], where=self._scoped_where())
         
         if result and result["documents"]:
-            return {
+            return self._load_bodies([{
                 "id": artifact_id,
                 "content": result["documents"][0],
                 "metadata": result["metadatas"][0] if result["metadatas"] else {}
-            }
+            }])[0]
         
         return None
     
-    def retrieve_artifacts_by_type(self, artifact_type):
+    def _load_bodies(self, artifacts):
+        """
+        Swap the stored preview of chunked artifacts for their full body
+        
+        Args:
+            artifacts (list): Dicts with "content" and "metadata"; updated in place
+            
+        Returns:
+            list: The same artifacts
+        """
+        refs = [(artifact.get("metadata") or {}).get("blob_ref") for artifact in artifacts
+                if (artifact.get("metadata") or {}).get("chunk_count")]
+        if not any(refs):
+            return artifacts
+        bodies = self.blob_store.get_many([ref for ref in refs if ref])
+        for artifact in artifacts:
+            metadata = artifact.get("metadata") or {}
+            if not metadata.get("chunk_count") or not metadata.get("blob_ref"):
+                continue
+            if metadata["blob_ref"] in bodies:
+                artifact["content"] = bodies[metadata["blob_ref"]]
+            else:
+                print(f"⚠️ Blob {metadata['blob_ref'][:12]} for {artifact.get('id')} is missing; returning the stored preview")
+        return artifacts
+    
+    def retrieve_artifacts_by_type(self, artifact_type, limit=None, offset=0, include=("documents", "metadatas")):
         """
         Retrieve all artifacts of a specific type
         
         Args:
             artifact_type (str): Type of artifacts to retrieve
+            limit (int): Maximum number of artifacts (None = all)
+            offset (int): Number of matching artifacts to skip
+            include (tuple): Fields to fetch besides the id ("documents", "metadatas")
             
         Returns:
             list: List of retrieved artifacts
         """
-        result = self.collection.get(
-            where={"type": artifact_type}
+        return self._cached_read(
+            "retrieve_artifacts_by_type",
+            (artifact_type, limit, offset, tuple(include)),
+            lambda: list(self.iter_artifacts(artifact_type, limit=limit, offset=offset, include=include))
         )
+    
+    def iter_artifacts(self, artifact_type=None, where=None, include=("documents", "metadatas"),
+                       page_size=100, limit=None, offset=0, include_chunks=False):
+        """
+        Page through artifacts without loading them all at once
         
-        artifacts = []
-        for i in range(len(result["ids"])):
-            artifacts.append({
-                "id": result["ids"][i],
-                "content": result["documents"][i],
-                "metadata": result["metadatas"][i] if result["metadatas"] else {}
-            })
+        Args:
+            artifact_type (str): Only artifacts of this type (optional)
+            where (dict): Extra metadata filter (optional)
+            include (tuple): Fields to fetch besides the id: "documents" -> "content",
+                "metadatas" -> "metadata". Pass () for ids only.
+            page_size (int): Artifacts fetched per round trip
+            limit (int): Stop after this many artifacts (None = all)
+            offset (int): Number of matching artifacts to skip
+            include_chunks (bool): Also yield the per-symbol chunks of code artifacts
+            
+        Yields:
+            dict: {"id", and "content"/"metadata" when requested}
+        """
+        if artifact_type is not None:
+            type_filter = {"type": artifact_type}
+        elif not include_chunks:
+            type_filter = {"type": {"$ne": CHUNK_TYPE}}
+        else:
+            type_filter = None
+        if type_filter is not None:
+            where = {"$and": [where, type_filter]} if where else type_filter
+        where = self._scoped_where(where)
+        include = list(include)
+        # Full bodies are found through the blob reference in the metadata
+        fetch = include + ["metadatas"] if "documents" in include and "metadatas" not in include else include
         
-        return artifacts
+        yielded = 0
+        while limit is None or yielded < limit:
+            page_limit = page_size if limit is None else min(page_size, limit - yielded)
+            result = self.collection.get(where=where, include=fetch, limit=page_limit, offset=offset)
+            ids = result["ids"]
+            page = []
+            for i, row_id in enumerate(ids):
+                artifact = {"id": self._artifact_id(row_id)}
+                if "documents" in include:
+                    artifact["content"] = result["documents"][i]
+                if "metadatas" in fetch:
+                    artifact["metadata"] = result["metadatas"][i] if result["metadatas"] else {}
+                page.append(artifact)
+            if "documents" in include:
+                self._load_bodies(page)
+            for artifact in page:
+                if "metadatas" not in include:
+                    artifact.pop("metadata", None)
+                yield artifact
+            yielded += len(ids)
+            offset += len(ids)
+            if len(ids) < page_limit:
+                break
     
-    def search_artifacts(self, query, n_results=5):
+    def search_artifacts(self, query, n_results=5, mode="hybrid"):
         """
         Search for artifacts based on a query
         
+        Chunk hits are folded into their parent artifact, which is returned with
+        the best-matching chunk under "matched_chunk" (symbol or part, kind, lines, content).
+        
         Args:
             query (str): Query string
             n_results (int): Number of results to return
+            mode (str): "vector" (embedding similarity), "keyword" (BM25) or
+                "hybrid" (both, fused with reciprocal rank fusion)
             
         Returns:
             list: List of matching artifacts
         """
-        result = self.collection.query(
-            query_texts=[query],
-            n_results=n_results
+        if mode not in ("vector", "keyword", "hybrid"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        return self._cached_read(
+            "search_artifacts",
+            (query, n_results, mode),
+            lambda: self._search_many([query], n_results, mode, self._scoped_where())[0]
         )
+    
+    def search_artifacts_batch(self, queries, n_results=5, where=None, mode="hybrid"):
+        """
+        Search for several queries at once
         
-        artifacts = []
-        for i in range(len(result["ids"][0])):
-            artifacts.append({
-                "id": result["ids"][0][i],
-                "content": result["documents"][0][i],
-                "metadata": result["metadatas"][0][i] if result["metadatas"] else {},
-                "distance": result.get("distances", [[0]])[0][i]
-            })
+        All queries are embedded in one pass and probed with a single Chroma
+        query; document reads are shared between them.
         
-        return artifacts
+        Args:
+            queries (list): Query strings
+            n_results (int): Number of results per query
+            where (dict): Metadata filter applied to every query (optional)
+            mode (str): "vector", "keyword" or "hybrid", as in search_artifacts
+            
+        Returns:
+            list: One result list per query, in the order of the queries
+        """
+        if mode not in ("vector", "keyword", "hybrid"):
+            raise ValueError(f"Unknown search mode: {mode}")
+        queries = list(queries)
+        if not queries:
+            return []
+        return self._cached_read(
+            "search_artifacts_batch",
+            (tuple(queries), n_results, where, mode),
+            lambda: self._search_many(queries, n_results, mode, self._scoped_where(where))
+        )
+    
+    def _search_many(self, queries, n_results, mode, where):
+        """Uncached search; see search_artifacts"""
+        # Several hits can fold into one artifact, and fusion needs more than
+        # n_results candidates from each ranking
+        n_candidates = max(n_results * 4, 20)
+        
+        rows = {}  # shared by all queries
+        distances = [{} for _ in queries]
+        rankings = [[] for _ in queries]
+        if mode in ("vector", "hybrid"):
+            # Embed the queries ourselves: a collection being re-indexed is still
+            # open without an embedding function
+            result = self.collection.query(
+                query_embeddings=self.embedding_function.embed_query(queries),
+                n_results=n_candidates,
+                where=where
+            )
+            
+            for q in range(len(queries)):
+                for i in range(len(result["ids"][q])):
+                    doc_id = result["ids"][q][i]
+                    rows[doc_id] = {
+                        "id": doc_id,
+                        "content": result["documents"][q][i],
+                        "metadata": result["metadatas"][q][i] if result["metadatas"] else {}
+                    }
+                    distances[q][doc_id] = result["distances"][q][i] if result.get("distances") else 0
+                rankings[q].append(result["ids"][q])
+        
+        if mode in ("keyword", "hybrid"):
+            index = self._keyword_index()
+            keyword_rankings = [[doc_id for doc_id, _ in index.search(query, n_candidates)] for query in queries]
+            keyword_ids = list(dict.fromkeys(doc_id for ranking in keyword_rankings for doc_id in ranking))
+            allowed = set()
+            if keyword_ids:
+                # One read applies the filters and brings back metadata for all keyword hits
+                result = self.collection.get(ids=keyword_ids, where=where, include=["documents", "metadatas"])
+                for i, doc_id in enumerate(result["ids"]):
+                    rows.setdefault(doc_id, {
+                        "id": doc_id,
+                        "content": result["documents"][i],
+                        "metadata": result["metadatas"][i] if result["metadatas"] else {}
+                    })
+                allowed = set(result["ids"])
+            for q, ranking in enumerate(keyword_rankings):
+                rankings[q].append([doc_id for doc_id in ranking if doc_id in allowed])
+        
+        # Fold chunk hits into their parent artifacts, keeping each parent's best chunk
+        folded = []
+        for q in range(len(queries)):
+            best_chunk = {}
+            best_distance = {}
+            parent_rankings = []
+            for ranking in rankings[q]:
+                parents = []
+                for doc_id in ranking:
+                    parent_id = (rows[doc_id]["metadata"] or {}).get("parent_id") or doc_id
+                    if parent_id != doc_id:
+                        best_chunk.setdefault(parent_id, doc_id)
+                    if doc_id in distances[q]:
+                        distance = distances[q][doc_id]
+                        best_distance[parent_id] = min(best_distance.get(parent_id, distance), distance)
+                    if parent_id not in parents:
+                        parents.append(parent_id)
+                parent_rankings.append(parents)
+            
+            if len(parent_rankings) == 1:
+                fused = [(parent_id, None) for parent_id in parent_rankings[0][:n_results]]
+            else:
+                fused = reciprocal_rank_fusion(parent_rankings)[:n_results]
+            folded.append((fused, best_chunk, best_distance))
+        
+        # Parents that only matched through a chunk still need their document and metadata
+        missing = list(dict.fromkeys(
+            parent_id for fused, _, _ in folded for parent_id, _ in fused if parent_id not in rows
+        ))
+        if missing:
+            result = self.collection.get(ids=missing, include=["documents", "metadatas"])
+            for i, doc_id in enumerate(result["ids"]):
+                rows[doc_id] = {
+                    "id": doc_id,
+                    "content": result["documents"][i],
+                    "metadata": result["metadatas"][i] if result["metadatas"] else {}
+                }
+        
+        results = []
+        for fused, best_chunk, best_distance in folded:
+            artifacts = []
+            for parent_id, score in fused:
+                if parent_id not in rows:
+                    continue
+                artifact = dict(rows[parent_id], id=self._artifact_id(parent_id), distance=best_distance.get(parent_id))
+                if score is not None:
+                    artifact["score"] = score
+                if parent_id in best_chunk:
+                    chunk = rows[best_chunk[parent_id]]
+                    artifact["matched_chunk"] = {
+                        "id": self._artifact_id(chunk["id"]),
+                        "symbol": chunk["metadata"].get("symbol"),
+                        "kind": chunk["metadata"].get("kind"),
+                        "start_line": chunk["metadata"].get("start_line"),
+                        "end_line": chunk["metadata"].get("end_line"),
+                        "part": chunk["metadata"].get("part"),
+                        "content": chunk["content"]
+                    }
+                artifacts.append(artifact)
+            results.append(self._load_bodies(artifacts))
+        
+        return results
     
     def update_artifact(self, artifact_id, content=None, metadata=None):
         """
@@ -177,19 +1358,88 @@ class DatabaseManager:
         Returns:
             bool: Success status
         """
-        update_args = {}
+        if content is None and metadata is None:
+            return False
         
+        with self._write_lock:
+            return self._update_artifact(artifact_id, content, metadata)
+    
+    def _update_artifact(self, artifact_id, content, metadata):
+        """Body of update_artifact; runs under the write lock"""
         if content is not None:
-            update_args["documents"] = [content]
+            current = self.collection.get(ids=[self._row_id(artifact_id)], include=["metadatas"])
+            current_metadata = (current["metadatas"][0] or {}) if current["metadatas"] else {}
+            if self.content_hash(content) != current_metadata.get("content_hash"):
+                # Changed content goes through the regular write path so its chunks
+                # and hash stay consistent; identical content keeps its embedding
+                merged = {key: value for key, value in current_metadata.items()
+                          if key not in ("content_hash", "chunk_count", "blob_ref")}
+                merged.update(metadata or {})
+                report = self.store_artifacts([{"id": artifact_id, "content": content, "metadata": merged}])
+                return artifact_id not in report["failed"]
         
         if metadata is not None:
-            update_args["metadatas"] = [metadata]
-        
-        if update_args:
             self.collection.update(
-                ids=[artifact_id],
-                **update_args
+                ids=[self._row_id(artifact_id)],
+                metadatas=[metadata]
             )
-            return True
+            self._bump_version()
+        
+        return True
+    
+    def list_versions(self, artifact_id):
+        """
+        Recorded versions of an artifact, oldest first
+        
+        Args:
+            artifact_id (str): Artifact in the current project
+            
+        Returns:
+            list: Dicts with "version", "kind" ("full" or "delta"), "content_hash",
+                "run_id", "created_at" and "stored_bytes"
+        """
+        return self.history.list_versions(self._collection_name_for(self.project_id), artifact_id)
+    
+    def get_version(self, artifact_id, n):
+        """
+        Content of an artifact as of one version
+        
+        Args:
+            artifact_id (str): Artifact in the current project
+            n (int): Version number (1 = first); -1 is the latest, -2 the one before...
+            
+        Returns:
+            str: The content, or None if there is no such version
+        """
+        try:
+            return self.history.get_version(self._collection_name_for(self.project_id), artifact_id, n)
+        except KeyError:
+            return None
+    
+    def diff(self, artifact_id, a, b, context=3):
+        """
+        Unified diff between two versions of an artifact
         
-        return False
\ No newline at end of file
+        Args:
+            artifact_id (str): Artifact in the current project
+            a (int): Version to diff from (see get_version)
+            b (int): Version to diff to
+            context (int): Unchanged lines shown around each change
+            
+        Returns:
+            str: The diff ("" when the versions are identical)
+        """
+        old = self.get_version(artifact_id, a)
+        new = self.get_version(artifact_id, b)
+        if old is None or new is None:
+            raise ValueError(f"{artifact_id} has no version {a if old is None else b}")
+        # Compare bare lines, so a last line without a newline does not run into the next one
+        lines = difflib.unified_diff(
+            old.splitlines(),
+            new.splitlines(),
+            fromfile=f"{artifact_id}@v{a}",
+            tofile=f"{artifact_id}@v{b}",
+            n=context,
+            lineterm=""
+        )
+        return "".join(line + "\n" for line in lines)
@@ -0,0 +1,248 @@
+# database/embeddings.py
+"""
+Local embedding function for the artifact store
+
+Embeds documents and queries on the CPU with all-MiniLM-L6-v2, either through
+sentence-transformers (when installed) or through the ONNX Runtime build that
+ships with chromadb, so no call leaves the machine. Vectors are cached on disk
+keyed by a hash of the model and the text; unchanged artifacts and repeated
+queries are only ever embedded once.
+"""
+import hashlib
+import os
+import sqlite3
+import threading
+
+import numpy as np
+from chromadb.api.types import EmbeddingFunction
+from chromadb.utils.embedding_functions import register_embedding_function
+
+DEFAULT_MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+DEFAULT_CACHE_PATH = "./embedding_cache.sqlite3"
+DEFAULT_BATCH_SIZE = 32
+# Files the ONNX MiniLM needs, as laid out in chromadb's onnx.tar.gz
+ONNX_MODEL_FILES = ("config.json", "model.onnx", "special_tokens_map.json", "tokenizer_config.json",
+                    "tokenizer.json", "vocab.txt")
+
+
+class EmbeddingCache:
+    def __init__(self, path=None):
+        """
+        Open (or create) the embedding cache
+
+        Args:
+            path (str): SQLite file. Defaults to EMBEDDING_CACHE_PATH or ./embedding_cache.sqlite3
+        """
+        self.path = path or os.environ.get("EMBEDDING_CACHE_PATH", DEFAULT_CACHE_PATH)
+        self.hits = 0
+        self.misses = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                vector BLOB NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name, text):
+        """Hash the model name and the exact text"""
+        return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys):
+        """
+        Look up several vectors at once
+
+        Returns:
+            dict: key -> float32 vector for the keys that were found
+        """
+        found = {}
+        with self._lock:
+            # Stay under SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                for key, vector in rows:
+                    found[key] = np.frombuffer(vector, dtype=np.float32)
+            self.hits += len(found)
+            self.misses += len(set(keys)) - len(found)
+        return found
+
+    def put_many(self, model_name, items):
+        """
+        Store vectors
+
+        Args:
+            model_name (str): Model that produced the vectors
+            items (dict): key -> vector
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, model, vector) VALUES (?, ?, ?)",
+                [(key, model_name, np.asarray(vector, dtype=np.float32).tobytes())
+                 for key, vector in items.items()]
+            )
+            self._conn.commit()
+
+    def clear(self):
+        """Drop every cached vector"""
+        with self._lock:
+            self._conn.execute("DELETE FROM embeddings")
+            self._conn.commit()
+
+    def stats(self):
+        """Entry count and hit/miss counters"""
+        with self._lock:
+            entries = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        return {"entries": entries, "hits": self.hits, "misses": self.misses, "path": self.path}
+
+
+@register_embedding_function
+class LocalEmbeddingFunction(EmbeddingFunction):
+    def __init__(self, model_name=DEFAULT_MODEL_NAME, batch_size=DEFAULT_BATCH_SIZE, cache_path=None,
+                 use_cache=True):
+        """
+        Local CPU embedding function
+
+        Args:
+            model_name (str): Sentence-transformers model id, or a local directory
+                (EMBEDDING_MODEL_PATH overrides it, for air-gapped hosts)
+            batch_size (int): Documents per forward pass
+            cache_path (str): Embedding cache file (see EmbeddingCache)
+            use_cache (bool): Keep vectors in the on-disk cache
+        """
+        self.model_name = model_name
+        self.batch_size = int(batch_size)
+        self.cache_path = cache_path
+        self.use_cache = use_cache
+        self.cache = EmbeddingCache(cache_path) if use_cache else None
+        self.backend = None
+        self._engine = None
+        self._engine_lock = threading.Lock()
+
+    def _load_engine(self):
+        """Load sentence-transformers if it is installed, else chromadb's ONNX MiniLM"""
+        with self._engine_lock:
+            if self._engine is not None:
+                return self._engine
+            model_path = os.environ.get("EMBEDDING_MODEL_PATH", self.model_name)
+            try:
+                from sentence_transformers import SentenceTransformer
+                model = SentenceTransformer(model_path, device="cpu")
+                self._engine = lambda texts: model.encode(
+                    texts, batch_size=self.batch_size, convert_to_numpy=True, normalize_embeddings=True
+                )
+                self.backend = "sentence-transformers"
+            except ImportError:
+                if not self.model_name.endswith("all-MiniLM-L6-v2"):
+                    raise ValueError(
+                        f"{self.model_name} needs sentence-transformers; only all-MiniLM-L6-v2 has an ONNX fallback"
+                    )
+                from chromadb.utils.embedding_functions import ONNXMiniLM_L6_V2
+                model = ONNXMiniLM_L6_V2(preferred_providers=["CPUExecutionProvider"])
+                if "EMBEDDING_MODEL_PATH" in os.environ:
+                    # Air-gapped hosts: read the extracted model from disk, never download it
+                    model.DOWNLOAD_PATH, model.EXTRACTED_FOLDER_NAME = self._onnx_model_dir(model_path)
+                # Otherwise it is read from ~/.cache/chroma/onnx_models (downloaded once if missing)
+                self._engine = lambda texts: np.asarray(model(texts), dtype=np.float32)
+                self.backend = "onnxruntime"
+            print(f"✅ Local embedding model ready ({self.backend}): {model_path}")
+            return self._engine
+
+    @staticmethod
+    def _onnx_model_dir(model_path):
+        """
+        Locate the ONNX MiniLM files under EMBEDDING_MODEL_PATH
+
+        Accepts the directory holding the files or its parent with an onnx/
+        folder (the layout of ~/.cache/chroma/onnx_models/all-MiniLM-L6-v2).
+
+        Returns:
+            tuple: (parent directory, folder name) for ONNXMiniLM_L6_V2
+        """
+        for folder in (os.path.join(model_path, "onnx"), model_path):
+            if all(os.path.exists(os.path.join(folder, name)) for name in ONNX_MODEL_FILES):
+                folder = os.path.abspath(folder)
+                return os.path.dirname(folder), os.path.basename(folder)
+        raise ValueError(
+            f"EMBEDDING_MODEL_PATH={model_path} does not contain the ONNX all-MiniLM-L6-v2 files "
+            f"({', '.join(ONNX_MODEL_FILES)}); copy ~/.cache/chroma/onnx_models/all-MiniLM-L6-v2 "
+            "from a machine with internet access, or install sentence-transformers"
+        )
+
+    def __call__(self, input):
+        """Embed documents, serving repeats from the cache"""
+        texts = list(input)
+        if not texts:
+            return []
+
+        keys = [EmbeddingCache.make_key(self.model_name, text) for text in texts]
+        vectors = self.cache.get_many(keys) if self.cache is not None else {}
+
+        # Embed each distinct missing text once, batch by batch
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors and key not in missing:
+                missing[key] = text
+        if missing:
+            engine = self._engine or self._load_engine()
+            pending = list(missing.items())
+            computed = {}
+            for start in range(0, len(pending), self.batch_size):
+                batch = pending[start:start + self.batch_size]
+                embedded = engine([text for _, text in batch])
+                for (key, _), vector in zip(batch, embedded):
+                    computed[key] = np.asarray(vector, dtype=np.float32)
+            if self.cache is not None:
+                self.cache.put_many(self.model_name, computed)
+            vectors.update(computed)
+
+        return [vectors[key] for key in keys]
+
+    def embed_query(self, input):
+        """Queries go through the same cache as documents"""
+        return self(input)
+
+    @staticmethod
+    def name():
+        return "local_minilm"
+
+    def default_space(self):
+        return "l2"
+
+    def supported_spaces(self):
+        return ["l2", "cosine", "ip"]
+
+    def get_config(self):
+        return {
+            "model_name": self.model_name,
+            "batch_size": self.batch_size,
+            "cache_path": self.cache_path,
+            "use_cache": self.use_cache
+        }
+
+    @staticmethod
+    def build_from_config(config):
+        return LocalEmbeddingFunction(
+            model_name=config.get("model_name", DEFAULT_MODEL_NAME),
+            batch_size=config.get("batch_size", DEFAULT_BATCH_SIZE),
+            cache_path=config.get("cache_path"),
+            use_cache=config.get("use_cache", True)
+        )
+
+    def validate_config_update(self, old_config, new_config):
+        if "model_name" in new_config and new_config["model_name"] != old_config.get("model_name"):
+            raise ValueError("The embedding model of an existing collection cannot be changed")
+
+    @staticmethod
+    def validate_config(config):
+        pass
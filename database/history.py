@@ -0,0 +1,200 @@
+# database/history.py
+"""
+Version history of artifact contents
+
+Every time an artifact's content changes, a new version is recorded as a
+line-level delta against the previous one, with a full copy every
+SNAPSHOT_INTERVAL versions. Rebuilding any version therefore replays at most
+SNAPSHOT_INTERVAL - 1 deltas, while the common case (a regenerated file that
+changed in a few places) costs only the changed lines on disk.
+"""
+import difflib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+
+DEFAULT_HISTORY_PATH = "./artifact_history.sqlite3"
+SNAPSHOT_INTERVAL = 10
+
+
+def make_delta(old, new):
+    """
+    Line-level delta turning old into new
+
+    Returns:
+        list: ["=", start, end] copies old lines [start, end); ["+", [lines]] inserts new lines
+    """
+    old_lines = old.splitlines(keepends=True)
+    new_lines = new.splitlines(keepends=True)
+    ops = []
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            ops.append(["=", i1, i2])
+        elif j2 > j1:
+            ops.append(["+", new_lines[j1:j2]])
+    return ops
+
+
+def apply_delta(old, ops):
+    """Rebuild the new text from the old text and a make_delta result"""
+    old_lines = old.splitlines(keepends=True)
+    parts = []
+    for op in ops:
+        if op[0] == "=":
+            parts.extend(old_lines[op[1]:op[2]])
+        else:
+            parts.extend(op[1])
+    return "".join(parts)
+
+
+class ArtifactHistory:
+    def __init__(self, path=None, snapshot_interval=SNAPSHOT_INTERVAL):
+        """
+        Open (or create) the history store
+
+        Args:
+            path (str): SQLite file. Defaults to ARTIFACT_HISTORY_PATH or ./artifact_history.sqlite3
+            snapshot_interval (int): Store a full copy every this many versions
+        """
+        self.path = path or os.environ.get("ARTIFACT_HISTORY_PATH", DEFAULT_HISTORY_PATH)
+        self.snapshot_interval = max(1, int(snapshot_interval))
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS versions (
+                collection TEXT NOT NULL,
+                artifact_id TEXT NOT NULL,
+                version INTEGER NOT NULL,
+                kind TEXT NOT NULL,
+                payload BLOB NOT NULL,
+                content_hash TEXT NOT NULL,
+                run_id TEXT,
+                created_at REAL NOT NULL,
+                PRIMARY KEY (collection, artifact_id, version)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def _latest(self, collection, artifact_id):
+        """(version, content_hash) of the newest version, or (0, None)"""
+        row = self._conn.execute(
+            "SELECT version, content_hash FROM versions WHERE collection = ? AND artifact_id = ? "
+            "ORDER BY version DESC LIMIT 1",
+            (collection, artifact_id)
+        ).fetchone()
+        return row if row else (0, None)
+
+    def _rebuild(self, collection, artifact_id, version):
+        """Content of a version: nearest full copy at or before it, then the deltas after it"""
+        rows = self._conn.execute(
+            "SELECT version, kind, payload FROM versions WHERE collection = ? AND artifact_id = ? "
+            "AND version <= ? AND version >= ("
+            "  SELECT MAX(version) FROM versions WHERE collection = ? AND artifact_id = ? "
+            "  AND version <= ? AND kind = 'full'"
+            ") ORDER BY version",
+            (collection, artifact_id, version, collection, artifact_id, version)
+        ).fetchall()
+        if not rows or rows[-1][0] != version:
+            raise KeyError(f"{artifact_id} has no version {version}")
+        content = None
+        for _, kind, payload in rows:
+            data = zlib.decompress(payload).decode("utf-8")
+            content = data if kind == "full" else apply_delta(content, json.loads(data))
+        return content
+
+    def record_many(self, collection, artifacts, run_id=None):
+        """
+        Append a version for every artifact whose content differs from its latest one
+
+        Args:
+            collection (str): Collection the artifacts belong to
+            artifacts (list): (artifact id, content, content hash) tuples
+            run_id (str): Run that produced the content (optional)
+
+        Returns:
+            dict: artifact id -> new version number, for the artifacts that got one
+        """
+        recorded = {}
+        with self._lock:
+            for artifact_id, content, content_hash in artifacts:
+                latest, latest_hash = self._latest(collection, artifact_id)
+                if latest_hash == content_hash:
+                    continue
+                version = latest + 1
+                if (version - 1) % self.snapshot_interval == 0:
+                    kind, data = "full", content
+                else:
+                    previous = self._rebuild(collection, artifact_id, latest)
+                    kind, data = "delta", json.dumps(make_delta(previous, content))
+                self._conn.execute(
+                    "INSERT INTO versions (collection, artifact_id, version, kind, payload, content_hash, "
+                    "run_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (collection, artifact_id, version, kind, zlib.compress(data.encode("utf-8")),
+                     content_hash, run_id, time.time())
+                )
+                recorded[artifact_id] = version
+            self._conn.commit()
+        return recorded
+
+    def get_version(self, collection, artifact_id, version):
+        """
+        Content of one version
+
+        Args:
+            version (int): 1 is the first version; negative numbers count back from the latest
+
+        Raises:
+            KeyError: The artifact has no such version
+        """
+        with self._lock:
+            if version < 0:
+                latest, _ = self._latest(collection, artifact_id)
+                version = latest + 1 + version
+            return self._rebuild(collection, artifact_id, version)
+
+    def list_versions(self, collection, artifact_id):
+        """
+        Versions of an artifact, oldest first
+
+        Returns:
+            list: Dicts with "version", "kind", "content_hash", "run_id", "created_at" and "stored_bytes"
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT version, kind, content_hash, run_id, created_at, LENGTH(payload) FROM versions "
+                "WHERE collection = ? AND artifact_id = ? ORDER BY version",
+                (collection, artifact_id)
+            ).fetchall()
+        return [
+            {"version": version, "kind": kind, "content_hash": content_hash, "run_id": run_id,
+             "created_at": created_at, "stored_bytes": stored_bytes}
+            for version, kind, content_hash, run_id, created_at, stored_bytes in rows
+        ]
+
+    def delete(self, collection, artifact_ids=None):
+        """Forget the history of some artifacts (or of a whole collection)"""
+        with self._lock:
+            if artifact_ids is None:
+                self._conn.execute("DELETE FROM versions WHERE collection = ?", (collection,))
+            else:
+                self._conn.executemany(
+                    "DELETE FROM versions WHERE collection = ? AND artifact_id = ?",
+                    [(collection, artifact_id) for artifact_id in artifact_ids]
+                )
+            self._conn.commit()
+
+    def stats(self):
+        """Version counts and stored size"""
+        with self._lock:
+            versions, artifacts, stored = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT collection || '/' || artifact_id), "
+                "COALESCE(SUM(LENGTH(payload)), 0) FROM versions"
+            ).fetchone()
+        return {"versions": versions, "artifacts": artifacts, "stored_bytes": stored, "path": self.path}
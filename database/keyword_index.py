@@ -0,0 +1,127 @@
+# database/keyword_index.py
+"""
+In-memory BM25 index over artifact contents
+
+Embedding similarity misses exact identifier matches (function names, class
+names, ticket keys), so the artifact store keeps a keyword index alongside each
+collection and fuses both rankings with reciprocal rank fusion.
+"""
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+TOKEN_PATTERN = re.compile(r"[A-Za-z0-9_]+")
+CAMEL_BOUNDARY = re.compile(r"(?<=[a-z0-9])(?=[A-Z])")
+
+
+def tokenize(text):
+    """
+    Lowercased word tokens; identifiers also yield their snake_case/camelCase parts
+
+    "createTask" and "create_task" both produce the whole identifier plus
+    "create" and "task".
+    """
+    tokens = []
+    for word in TOKEN_PATTERN.findall(text or ""):
+        lowered = word.lower()
+        tokens.append(lowered)
+        parts = [part.lower() for piece in word.split("_") for part in CAMEL_BOUNDARY.split(piece) if part]
+        if len(parts) > 1:
+            tokens.extend(parts)
+    return tokens
+
+
+class BM25Index:
+    def __init__(self, k1=1.5, b=0.75):
+        """
+        Empty index
+
+        Args:
+            k1 (float): Term frequency saturation
+            b (float): Document length normalization
+        """
+        self.k1 = k1
+        self.b = b
+        self._postings = defaultdict(dict)  # term -> {doc_id: term frequency}
+        self._doc_terms = {}  # doc_id -> Counter, needed to remove a document
+        self._doc_lengths = {}
+        self._total_length = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._doc_terms)
+
+    def add(self, doc_id, text):
+        """Index a document, replacing any previous version"""
+        counts = Counter(tokenize(text))
+        with self._lock:
+            self._remove(doc_id)
+            self._doc_terms[doc_id] = counts
+            self._doc_lengths[doc_id] = sum(counts.values())
+            self._total_length += self._doc_lengths[doc_id]
+            for term, frequency in counts.items():
+                self._postings[term][doc_id] = frequency
+
+    def add_many(self, docs):
+        """Index (doc_id, text) pairs"""
+        for doc_id, text in docs:
+            self.add(doc_id, text)
+
+    def remove(self, doc_id):
+        """Drop a document from the index"""
+        with self._lock:
+            self._remove(doc_id)
+
+    def _remove(self, doc_id):
+        counts = self._doc_terms.pop(doc_id, None)
+        if counts is None:
+            return
+        self._total_length -= self._doc_lengths.pop(doc_id)
+        for term in counts:
+            postings = self._postings[term]
+            postings.pop(doc_id, None)
+            if not postings:
+                del self._postings[term]
+
+    def search(self, query, n_results=10):
+        """
+        Rank documents against a query
+
+        Returns:
+            list: (doc_id, score) pairs, best first
+        """
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_terms)
+            if not n_docs or not terms:
+                return []
+            avg_length = self._total_length / n_docs
+            scores = defaultdict(float)
+            for term in terms:
+                postings = self._postings.get(term)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_lengths[doc_id] / avg_length)
+                    scores[doc_id] += idf * frequency * (self.k1 + 1) / (frequency + norm)
+        return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:n_results]
+
+
+def reciprocal_rank_fusion(rankings, k=60):
+    """
+    Fuse several ranked id lists
+
+    Args:
+        rankings (list): Lists of ids, best first
+        k (int): Damping constant; 60 is the usual choice
+
+    Returns:
+        list: (id, fused score) pairs, best first
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
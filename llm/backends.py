@@ -0,0 +1,217 @@
+# llm/backends.py
+"""
+Pluggable LLM backends
+
+Every backend is called like a transformers text-generation pipeline,
+backend(prompt, **generation_kwargs) -> [{"generated_text": prompt + completion}],
+so the agents work unchanged whichever one they are given. complete() returns
+just the completion for callers that only want the text.
+
+Backends are chosen per agent with a spec string:
+    "hf:<model>" / "transformers:<model>"  in-process transformers pipeline
+    "ollama:<model>"                       Ollama over HTTP
+    "fake"                                 deterministic canned responses
+"""
+import json
+import os
+
+from llm.model_registry import get_model_registry
+from llm.ollama_client import get_ollama_client
+from llm.response_cache import CachedPipeline
+
+AGENT_ROLES = ("business_analyst", "developer", "tester", "project_manager")
+# Rough prompt-length estimate for backends without a local tokenizer
+CHARS_PER_TOKEN = 4
+
+
+class LLMBackend:
+    """Base class for backends"""
+
+    name = "base"
+
+    def __call__(self, text_inputs, **generation_kwargs):
+        if isinstance(text_inputs, str):
+            return self._generate_one(text_inputs, generation_kwargs)
+        return [self._generate_one(prompt, generation_kwargs) for prompt in text_inputs]
+
+    def _generate_one(self, prompt, generation_kwargs):
+        completion = self._complete(prompt, **generation_kwargs)
+        if generation_kwargs.get("return_full_text", True):
+            return [{"generated_text": prompt + completion}]
+        return [{"generated_text": completion}]
+
+    def _complete(self, prompt, **generation_kwargs):
+        raise NotImplementedError
+
+    def complete(self, prompt, **generation_kwargs):
+        """
+        Generate a completion for a prompt
+
+        Returns:
+            str: The generated text without the prompt
+        """
+        output = self(prompt, **dict(generation_kwargs, return_full_text=False))
+        text = output[0].get("generated_text", "")
+        return text[len(prompt):] if text.startswith(prompt) else text
+
+    def describe(self):
+        return self.name
+
+    def close(self):
+        """Release whatever the backend holds; it must not be used afterwards"""
+
+
+class TransformersBackend(CachedPipeline, LLMBackend):
+    """In-process transformers pipeline shared through the model registry"""
+
+    name = "transformers"
+
+    def __init__(self, model_name, task="text-generation", cache=None):
+        super().__init__(get_model_registry().acquire(model_name, task), model_id=model_name, cache=cache)
+        self.model_name = model_name
+        self.task = task
+        self._closed = False
+
+    def describe(self):
+        return f"{self.name}:{self.model_name}"
+
+    def close(self):
+        """Give the model's registry reference back, so it can be evicted under memory pressure"""
+        if not self._closed:
+            self._closed = True
+            get_model_registry().release(self.model_name, self.task)
+
+
+class OllamaBackend(LLMBackend):
+    """Ollama server over its HTTP /api/generate endpoint, through the shared pooled client"""
+
+    name = "ollama"
+    tokenizer = None
+
+    def __init__(self, model="codellama:7b", base_url=None):
+        self.model = model
+        self.client = get_ollama_client(base_url)
+
+    def describe(self):
+        return f"{self.name}:{self.model}"
+
+    def _options(self, prompt, generation_kwargs):
+        options = {}
+        max_tokens = generation_kwargs.get("max_new_tokens")
+        if max_tokens is None and generation_kwargs.get("max_length"):
+            # max_length counts the prompt too; without a tokenizer, estimate ~4 characters per token
+            max_tokens = max(generation_kwargs["max_length"] - len(prompt) // CHARS_PER_TOKEN, 1)
+        if max_tokens:
+            options["num_predict"] = max_tokens
+        if generation_kwargs.get("do_sample") is False:
+            options["temperature"] = 0
+        elif "temperature" in generation_kwargs:
+            options["temperature"] = generation_kwargs["temperature"]
+        if "top_p" in generation_kwargs:
+            options["top_p"] = generation_kwargs["top_p"]
+        return options
+
+    def _complete(self, prompt, **generation_kwargs):
+        data = self.client.generate(self.model, prompt, options=self._options(prompt, generation_kwargs))
+        if "response" not in data:
+            raise ValueError(f"Unexpected response format from Ollama: {data}")
+        return data["response"]
+
+    def stream(self, prompt, **generation_kwargs):
+        """
+        Stream a completion from Ollama
+
+        Yields:
+            str: Text chunks as the server produces them
+        """
+        for data in self.client.stream_generate(self.model, prompt, options=self._options(prompt, generation_kwargs)):
+            if data.get("response"):
+                yield data["response"]
+
+    def is_available(self):
+        """Return True if the Ollama server answers"""
+        return self.client.is_available()
+
+
+class FakeBackend(LLMBackend):
+    """
+    Deterministic backend for tests, demos and offline runs
+
+    Picks a canned response by looking for each key of `responses` in the prompt;
+    the defaults cover the prompts of the built-in agents.
+    """
+
+    name = "fake"
+    tokenizer = None
+
+    DEFAULT_RESPONSES = {
+        "Business Analyst": json.dumps([
+            {
+                "title": "Create tasks",
+                "description": "As a user, I want to create tasks so that I can track my work.",
+                "acceptanceCriteria": ["A task has a title", "A task has a due date"],
+                "priority": "High"
+            },
+            {
+                "title": "View tasks",
+                "description": "As a user, I want to view my tasks so that I know what to do next.",
+                "acceptanceCriteria": ["Tasks are listed by due date"],
+                "priority": "Medium"
+            }
+        ], indent=2),
+        "QA Test Executor": json.dumps([
+            {"test_id": "test_create_task", "result": "PASS",
+             "explanation": "create_task returns the new task", "fix_suggestion": ""}
+        ], indent=2),
+        "QA Tester": "```python\ndef test_create_task():\n    assert create_task(\"Write report\")[\"title\"] == \"Write report\"\n```",
+        "Python Developer": "```python\ndef create_task(title):\n    return {\"title\": title, \"status\": \"To Do\"}\n```",
+    }
+
+    def __init__(self, responses=None, default="OK"):
+        self.responses = dict(responses) if responses is not None else dict(self.DEFAULT_RESPONSES)
+        self.default = default
+        self.calls = []
+
+    def _complete(self, prompt, **generation_kwargs):
+        self.calls.append(prompt)
+        for marker, response in self.responses.items():
+            if marker in prompt:
+                return response
+        return self.default
+
+    def stream(self, prompt, **generation_kwargs):
+        """Yield the canned response word by word"""
+        completion = self._complete(prompt, **generation_kwargs)
+        for idx, word in enumerate(completion.split(" ")):
+            yield word if idx == 0 else " " + word
+
+
+def create_backend(spec):
+    """
+    Create a backend from a spec string
+
+    Args:
+        spec (str): "fake", "ollama:<model>", "hf:<model>", "transformers:<model>"
+            or a bare Hugging Face model id
+
+    Returns:
+        LLMBackend: The backend
+    """
+    kind, _, target = spec.partition(":")
+    if spec == "fake":
+        return FakeBackend()
+    if kind == "ollama":
+        return OllamaBackend(model=target or "codellama:7b")
+    if kind in ("hf", "transformers"):
+        return TransformersBackend(target)
+    return TransformersBackend(spec)
+
+
+def backend_spec_for(role, default):
+    """
+    Resolve the backend spec for an agent role from the environment
+
+    <ROLE>_BACKEND (e.g. DEVELOPER_BACKEND=ollama:codellama:7b) wins over
+    LLM_BACKEND, which wins over the given default.
+    """
+    return os.environ.get(f"{role.upper()}_BACKEND") or os.environ.get("LLM_BACKEND") or default
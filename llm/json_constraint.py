@@ -0,0 +1,292 @@
+# llm/json_constraint.py
+"""
+Grammar-constrained decoding for user-story JSON
+
+A character-level automaton describes the only output the Business Analyst
+accepts: a JSON array of objects with "title", "description",
+"acceptanceCriteria" (non-empty array of strings) and "priority"
+("High", "Medium" or "Low"), in that order. A LogitsProcessor masks every
+token that would leave the automaton, so a constrained generation always
+parses; if the token budget runs out first, closing_suffix() completes it.
+"""
+import torch
+from transformers import LogitsProcessor
+
+WHITESPACE = " \n\t"
+MAX_WHITESPACE_RUN = 8
+ESCAPABLE = '"\\/bfnrt'
+PRIORITIES = ('"High"', '"Medium"', '"Low"')
+
+# Segments of one user-story object, matched in order
+OBJECT_SEGMENTS = (
+    ("lit", "{"),
+    ("lit", '"title"'), ("lit", ":"), ("str", None),
+    ("lit", ","), ("lit", '"description"'), ("lit", ":"), ("str", None),
+    ("lit", ","), ("lit", '"acceptanceCriteria"'), ("lit", ":"), ("strarray", None),
+    ("lit", ","), ("lit", '"priority"'), ("lit", ":"), ("enum", PRIORITIES),
+    ("lit", "}"),
+)
+
+# String sub-states
+STR_BEFORE, STR_EMPTY, STR_BODY, STR_ESCAPE = 0, 1, 2, 3
+# String-array sub-states
+ARR_BEFORE, ARR_FIRST, ARR_ITEM, ARR_AFTER_ITEM, ARR_AFTER_COMMA = 0, 1, 2, 3, 4
+
+# Top-level phases
+START, IN_OBJECT, AFTER_OBJECT, DONE = 0, 1, 2, 3
+
+INITIAL_STATE = (START, 0, 0, 0, 0)
+
+
+def _advance_string(sub, char):
+    """Advance a JSON string sub-state; return (new_sub, closed) or None if invalid"""
+    if sub == STR_BEFORE:
+        return (STR_EMPTY, False) if char == '"' else None
+    if sub == STR_ESCAPE:
+        return (STR_BODY, False) if char in ESCAPABLE else None
+    if char == '"':
+        # Empty strings are not useful stories
+        return (sub, True) if sub == STR_BODY else None
+    if char == "\\":
+        return (STR_ESCAPE, False)
+    if char < " ":
+        return None
+    return (STR_BODY, False)
+
+
+def advance(state, char):
+    """
+    Feed one character to the automaton
+
+    State is a tuple (phase, segment, position, sub_state, whitespace_run).
+
+    Returns:
+        tuple: The next state, or None if the character is not allowed
+    """
+    phase, segment, pos, sub, ws = state
+
+    if phase == DONE:
+        return None
+
+    at_boundary = (
+        phase in (START, AFTER_OBJECT)
+        or (phase == IN_OBJECT and _segment_at_boundary(segment, pos, sub))
+    )
+    if char in WHITESPACE and at_boundary:
+        # Optional whitespace between tokens, capped so the model cannot pad forever
+        return (phase, segment, pos, sub, ws + 1) if ws < MAX_WHITESPACE_RUN else None
+
+    if phase == START:
+        return (IN_OBJECT, 0, 0, 0, 0) if char == "[" else None
+
+    if phase == AFTER_OBJECT:
+        if char == ",":
+            return (IN_OBJECT, 0, 0, 0, 0)
+        if char == "]":
+            return (DONE, 0, 0, 0, 0)
+        return None
+
+    kind, value = OBJECT_SEGMENTS[segment]
+
+    if kind == "lit":
+        if char != value[pos]:
+            return None
+        pos += 1
+        if pos < len(value):
+            return (IN_OBJECT, segment, pos, 0, 0)
+        return _next_segment(segment)
+
+    if kind == "enum":
+        prefix = PRIORITIES_PREFIXES[pos] + char if pos < len(PRIORITIES_PREFIXES) else None
+        if prefix is None or prefix not in PRIORITIES_PREFIX_INDEX:
+            return None
+        if prefix in value:
+            return _next_segment(segment)
+        return (IN_OBJECT, segment, PRIORITIES_PREFIX_INDEX[prefix], 0, 0)
+
+    if kind == "str":
+        result = _advance_string(sub, char)
+        if result is None:
+            return None
+        new_sub, closed = result
+        if closed:
+            return _next_segment(segment)
+        return (IN_OBJECT, segment, 0, new_sub, 0)
+
+    # strarray: pos is the array sub-state, sub the string sub-state of the current item
+    if pos == ARR_BEFORE:
+        return (IN_OBJECT, segment, ARR_FIRST, 0, 0) if char == "[" else None
+    if pos in (ARR_FIRST, ARR_AFTER_COMMA):
+        return (IN_OBJECT, segment, ARR_ITEM, STR_EMPTY, 0) if char == '"' else None
+    if pos == ARR_ITEM:
+        result = _advance_string(sub, char)
+        if result is None:
+            return None
+        new_sub, closed = result
+        if closed:
+            return (IN_OBJECT, segment, ARR_AFTER_ITEM, 0, 0)
+        return (IN_OBJECT, segment, ARR_ITEM, new_sub, 0)
+    if pos == ARR_AFTER_ITEM:
+        if char == ",":
+            return (IN_OBJECT, segment, ARR_AFTER_COMMA, 0, 0)
+        if char == "]":
+            return _next_segment(segment)
+    return None
+
+
+def _segment_at_boundary(segment, pos, sub):
+    """True where optional whitespace may appear inside an object"""
+    kind = OBJECT_SEGMENTS[segment][0]
+    if kind == "lit" or kind == "enum":
+        return pos == 0
+    if kind == "str":
+        return sub == STR_BEFORE
+    return pos in (ARR_BEFORE, ARR_FIRST, ARR_AFTER_ITEM, ARR_AFTER_COMMA)
+
+
+def _next_segment(segment):
+    if segment + 1 < len(OBJECT_SEGMENTS):
+        return (IN_OBJECT, segment + 1, 0, 0, 0)
+    return (AFTER_OBJECT, 0, 0, 0, 0)
+
+
+def _build_prefixes(options):
+    prefixes = [""]
+    for option in options:
+        for end in range(1, len(option)):
+            if option[:end] not in prefixes:
+                prefixes.append(option[:end])
+    return prefixes
+
+
+PRIORITIES_PREFIXES = _build_prefixes(PRIORITIES)
+PRIORITIES_PREFIX_INDEX = {prefix: idx for idx, prefix in enumerate(PRIORITIES_PREFIXES)}
+PRIORITIES_PREFIX_INDEX.update({option: -1 for option in PRIORITIES})
+
+
+def advance_text(state, text):
+    """Feed a string to the automaton; return the final state or None"""
+    for char in text:
+        state = advance(state, char)
+        if state is None:
+            return None
+    return state
+
+
+def closing_suffix(state):
+    """
+    Shortest text that completes a partial document from the given state
+
+    Returns:
+        str: Characters to append so the output parses as valid user-story JSON
+    """
+    phase, segment, pos, sub, _ = state
+    if phase == DONE:
+        return ""
+    if phase == START:
+        return '[{"title": "Untitled", "description": "N/A", "acceptanceCriteria": ["N/A"], "priority": "Medium"}]'
+    if phase == AFTER_OBJECT:
+        return "]"
+
+    suffix = ""
+    kind, value = OBJECT_SEGMENTS[segment]
+    if kind == "lit":
+        suffix += value[pos:]
+    elif kind == "enum":
+        prefix = PRIORITIES_PREFIXES[pos]
+        option = next(option for option in PRIORITIES if option.startswith(prefix))
+        suffix += option[len(prefix):]
+    elif kind == "str":
+        suffix += {STR_BEFORE: '"N/A"', STR_EMPTY: 'N/A"', STR_BODY: '"', STR_ESCAPE: 'n"'}[sub]
+    else:
+        suffix += {
+            ARR_BEFORE: '["N/A"]',
+            ARR_FIRST: '"N/A"]',
+            ARR_AFTER_ITEM: "]",
+            ARR_AFTER_COMMA: '"N/A"]',
+        }.get(pos) or ({STR_EMPTY: 'N/A"]', STR_BODY: '"]', STR_ESCAPE: 'n"]'}[sub])
+
+    defaults = {"str": '"N/A"', "strarray": '["N/A"]', "enum": '"Medium"'}
+    for kind, value in OBJECT_SEGMENTS[segment + 1:]:
+        suffix += value if kind == "lit" else defaults[kind]
+    return suffix + "]"
+
+
+class UserStoryJsonLogitsProcessor(LogitsProcessor):
+    """Mask logits so generated text always follows the user-story JSON grammar"""
+
+    _vocab_cache = {}
+
+    def __init__(self, tokenizer):
+        self.tokenizer = tokenizer
+        self.eos_token_id = tokenizer.eos_token_id
+        self.token_texts = self._decoded_vocab(tokenizer)
+        self._mask_cache = {}
+        self.prompt_length = None
+        self.states = []
+        self.texts = []
+
+    def __repr__(self):
+        # Stable representation so the processor can be part of a cache key
+        return f"{self.__class__.__name__}()"
+
+    @classmethod
+    def _decoded_vocab(cls, tokenizer):
+        key = id(tokenizer)
+        if key not in cls._vocab_cache:
+            special = set(tokenizer.all_special_ids)
+            cls._vocab_cache[key] = [
+                "" if token_id in special else tokenizer.decode([token_id])
+                for token_id in range(len(tokenizer))
+            ]
+        return cls._vocab_cache[key]
+
+    def _allowed_mask(self, state, vocab_size, device):
+        cache_key = (state, vocab_size)
+        if cache_key not in self._mask_cache:
+            mask = torch.zeros(vocab_size, dtype=torch.bool)
+            if state[0] == DONE:
+                if self.eos_token_id is not None and self.eos_token_id < vocab_size:
+                    mask[self.eos_token_id] = True
+            else:
+                allowed = [
+                    token_id for token_id, text in enumerate(self.token_texts[:vocab_size])
+                    if text and advance_text(state, text) is not None
+                ]
+                mask[allowed] = True
+            self._mask_cache[cache_key] = mask
+        return self._mask_cache[cache_key].to(device)
+
+    def __call__(self, input_ids, scores):
+        if self.prompt_length is None:
+            self.prompt_length = input_ids.shape[-1]
+            self.states = [INITIAL_STATE for _ in range(input_ids.shape[0])]
+            self.texts = ["" for _ in range(input_ids.shape[0])]
+        elif input_ids.shape[-1] > self.prompt_length:
+            for row in range(input_ids.shape[0]):
+                token_id = int(input_ids[row, -1])
+                if self.states[row][0] == DONE or token_id >= len(self.token_texts):
+                    continue
+                text = self.token_texts[token_id]
+                new_state = advance_text(self.states[row], text)
+                if new_state is not None:
+                    self.states[row] = new_state
+                    self.texts[row] += text
+
+        vocab_size = scores.shape[-1]
+        for row in range(scores.shape[0]):
+            mask = self._allowed_mask(self.states[row], vocab_size, scores.device)
+            scores[row] = scores[row].masked_fill(~mask, float("-inf"))
+        return scores
+
+    def completed_text(self, row=0):
+        """
+        The constrained output for one row, closed off if generation stopped early
+
+        Returns:
+            str: Text guaranteed to parse as a JSON array of user stories,
+                or None if the processor never ran (e.g. a cached response)
+        """
+        if self.prompt_length is None:
+            return None
+        return self.texts[row] + closing_suffix(self.states[row])
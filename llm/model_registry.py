@@ -0,0 +1,194 @@
+# llm/model_registry.py
+"""
+Process-wide registry of Hugging Face pipelines.
+
+Every agent asks the registry for a model by name instead of building its own
+pipeline, so each set of weights is loaded once per process no matter how many
+agents (or Streamlit pages) use it.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from transformers import pipeline
+
+DEFAULT_MEMORY_BUDGET_MB = 4096
+
+
+def _current_rss_bytes():
+    """Return the resident set size of this process in bytes (0 if unknown)"""
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss
+    except ImportError:
+        pass
+
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def _model_size_bytes(hf_pipeline):
+    """Estimate the memory held by a pipeline's weights"""
+    model = getattr(hf_pipeline, "model", None)
+    if model is None or not hasattr(model, "parameters"):
+        return 0
+    total = sum(p.numel() * p.element_size() for p in model.parameters())
+    total += sum(b.numel() * b.element_size() for b in model.buffers())
+    return total
+
+
+class _ModelEntry:
+    def __init__(self, name, task, hf_pipeline, load_seconds, rss_delta_bytes):
+        self.name = name
+        self.task = task
+        self.pipeline = hf_pipeline
+        self.load_seconds = load_seconds
+        self.rss_delta_bytes = rss_delta_bytes
+        self.size_bytes = _model_size_bytes(hf_pipeline)
+        self.ref_count = 0
+        self.last_used = time.time()
+
+
+class ModelRegistry:
+    def __init__(self, memory_budget_mb=None):
+        """
+        Initialize the registry
+
+        Args:
+            memory_budget_mb (int): Soft limit for the combined size of loaded models.
+                Least-recently-used models nobody holds a reference to are evicted
+                once the budget is exceeded. Defaults to MODEL_MEMORY_BUDGET_MB
+                from the environment, or 4096.
+        """
+        if memory_budget_mb is None:
+            memory_budget_mb = int(os.environ.get("MODEL_MEMORY_BUDGET_MB", DEFAULT_MEMORY_BUDGET_MB))
+        self.memory_budget_bytes = int(memory_budget_mb) * 1024 * 1024
+        self._entries = OrderedDict()
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _key(model_name, task):
+        return (task, model_name)
+
+    def acquire(self, model_name, task="text-generation"):
+        """
+        Get a pipeline for a model, loading it on first use
+
+        Every call increments the model's reference count; pair it with release()
+        when the caller no longer needs the model.
+
+        Args:
+            model_name (str): Hugging Face model id
+            task (str): Pipeline task
+
+        Returns:
+            Pipeline: The shared pipeline instance
+        """
+        key = self._key(model_name, task)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._load(model_name, task)
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+            entry.ref_count += 1
+            entry.last_used = time.time()
+            self._evict_if_needed(keep=key)
+            return entry.pipeline
+
+    def release(self, model_name, task="text-generation"):
+        """
+        Drop one reference to a model
+
+        The model stays loaded until memory pressure evicts it.
+
+        Args:
+            model_name (str): Hugging Face model id
+            task (str): Pipeline task
+        """
+        key = self._key(model_name, task)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.ref_count > 0:
+                entry.ref_count -= 1
+            self._evict_if_needed()
+
+    def _load(self, model_name, task):
+        print(f"✅ Loading model '{model_name}' ({task}) into the registry")
+        rss_before = _current_rss_bytes()
+        start = time.perf_counter()
+        hf_pipeline = pipeline(task, model=model_name)
+        load_seconds = time.perf_counter() - start
+        rss_delta = max(_current_rss_bytes() - rss_before, 0)
+        entry = _ModelEntry(model_name, task, hf_pipeline, load_seconds, rss_delta)
+        print(f"✅ Loaded '{model_name}' in {load_seconds:.2f}s "
+              f"(+{rss_delta / (1024 * 1024):.1f} MB RSS)")
+        return entry
+
+    def _total_size_bytes(self):
+        return sum(entry.size_bytes for entry in self._entries.values())
+
+    def _evict_if_needed(self, keep=None):
+        """Evict least-recently-used, unreferenced models until under budget"""
+        for key in list(self._entries.keys()):
+            if self._total_size_bytes() <= self.memory_budget_bytes:
+                break
+            entry = self._entries[key]
+            if key == keep or entry.ref_count > 0:
+                continue
+            print(f"♻️ Evicting model '{entry.name}' from the registry")
+            del self._entries[key]
+
+    def evict(self, model_name, task="text-generation"):
+        """
+        Unload a model regardless of memory pressure
+
+        Returns:
+            bool: True if the model was loaded and has been evicted
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(model_name, task))
+            if entry is None or entry.ref_count > 0:
+                return False
+            del self._entries[self._key(model_name, task)]
+            return True
+
+    def stats(self):
+        """
+        Report the models currently loaded
+
+        Returns:
+            list: One dict per model with load time, RSS delta, size and ref count,
+                ordered from least to most recently used
+        """
+        with self._lock:
+            return [
+                {
+                    "model": entry.name,
+                    "task": entry.task,
+                    "ref_count": entry.ref_count,
+                    "load_seconds": round(entry.load_seconds, 3),
+                    "rss_mb": round(entry.rss_delta_bytes / (1024 * 1024), 1),
+                    "size_mb": round(entry.size_bytes / (1024 * 1024), 1),
+                    "last_used": entry.last_used,
+                }
+                for entry in self._entries.values()
+            ]
+
+
+_registry = None
+_registry_lock = threading.Lock()
+
+
+def get_model_registry():
+    """Return the process-wide ModelRegistry, creating it on first use"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = ModelRegistry()
+        return _registry
@@ -0,0 +1,355 @@
+# llm/ollama_client.py
+"""
+Shared HTTP client for the Ollama server
+
+One pooled, keep-alive requests.Session per server, a bounded number of
+requests in flight (extra callers queue on a semaphore), timeouts and
+jittered exponential retry on transient failures, and per-call latency
+metrics. AsyncOllamaClient/generate_many fan many prompts out on asyncio,
+taking their slots from (and reporting into) the same shared client.
+"""
+import asyncio
+import json
+import os
+import random
+import statistics
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+RETRY_STATUS_CODES = (429, 500, 502, 503, 504)
+
+
+class OllamaClient:
+    def __init__(self, base_url=None, max_concurrency=None, connect_timeout=5, read_timeout=None,
+                 max_retries=3, backoff_seconds=0.5, metrics_window=500):
+        """
+        Initialize the client
+
+        Args:
+            base_url (str): Ollama server URL (defaults to OLLAMA_BASE_URL or localhost:11434)
+            max_concurrency (int): Requests allowed in flight at once; further callers
+                wait in line. Defaults to OLLAMA_MAX_CONCURRENCY or 2.
+            connect_timeout (float): Seconds to wait for a connection
+            read_timeout (float): Seconds to wait for response data (defaults to
+                OLLAMA_TIMEOUT or 120)
+            max_retries (int): Retries on connection errors, timeouts and 429/5xx responses
+            backoff_seconds (float): Base delay for exponential backoff with full jitter
+            metrics_window (int): Number of recent calls kept for latency percentiles
+        """
+        self.base_url = (base_url or os.environ.get("OLLAMA_BASE_URL", DEFAULT_OLLAMA_URL)).rstrip("/")
+        if max_concurrency is None:
+            max_concurrency = int(os.environ.get("OLLAMA_MAX_CONCURRENCY", 2))
+        if read_timeout is None:
+            read_timeout = float(os.environ.get("OLLAMA_TIMEOUT", 120))
+        self.max_concurrency = max_concurrency
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+
+        # Keep-alive pool sized to the concurrency limit so connections are reused, not churned
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        self._metrics_lock = threading.Lock()
+        self._latencies = deque(maxlen=metrics_window)
+        self._queue_waits = deque(maxlen=metrics_window)
+        self._calls = 0
+        self._errors = 0
+        self._retries = 0
+        self._in_flight = 0
+        self._queued = 0
+
+    def _acquire(self):
+        with self._metrics_lock:
+            self._queued += 1
+        start = time.perf_counter()
+        self._semaphore.acquire()
+        waited = time.perf_counter() - start
+        with self._metrics_lock:
+            self._queued -= 1
+            self._in_flight += 1
+            self._queue_waits.append(waited)
+
+    async def _acquire_async(self, poll_interval=0.05):
+        """_acquire for coroutines: waits for a slot without blocking the event loop"""
+        with self._metrics_lock:
+            self._queued += 1
+        start = time.perf_counter()
+        try:
+            # Polling keeps a cancelled waiter from ever holding a slot it cannot give back
+            while not self._semaphore.acquire(blocking=False):
+                await asyncio.sleep(poll_interval)
+        finally:
+            with self._metrics_lock:
+                self._queued -= 1
+        with self._metrics_lock:
+            self._in_flight += 1
+            self._queue_waits.append(time.perf_counter() - start)
+
+    def _release(self):
+        with self._metrics_lock:
+            self._in_flight -= 1
+        self._semaphore.release()
+
+    def _record(self, latency, error=False):
+        with self._metrics_lock:
+            self._calls += 1
+            self._latencies.append(latency)
+            if error:
+                self._errors += 1
+
+    def _retry_delay(self, attempt, backoff_seconds=None):
+        with self._metrics_lock:
+            self._retries += 1
+        backoff_seconds = self.backoff_seconds if backoff_seconds is None else backoff_seconds
+        # Full jitter keeps concurrent retries from hammering the server in lockstep
+        return random.uniform(0, backoff_seconds * (2 ** attempt))
+
+    def _sleep_before_retry(self, attempt):
+        time.sleep(self._retry_delay(attempt))
+
+    def request(self, method, path, max_retries=None, stream=False, **kwargs):
+        """
+        Send a request through the pool, retrying transient failures
+
+        The concurrency slot is released between attempts so backing-off callers
+        do not block others. For stream=True the caller must close the response
+        and call release_stream() (stream_generate() does both).
+
+        Returns:
+            requests.Response: The successful response
+        """
+        retries = self.max_retries if max_retries is None else max_retries
+        url = f"{self.base_url}{path}"
+        for attempt in range(retries + 1):
+            self._acquire()
+            start = time.perf_counter()
+            keep_slot = False
+            try:
+                response = self.session.request(method, url, timeout=self.timeout, stream=stream, **kwargs)
+                if response.status_code in RETRY_STATUS_CODES and attempt < retries:
+                    response.close()
+                    self._record(time.perf_counter() - start, error=True)
+                else:
+                    response.raise_for_status()
+                    self._record(time.perf_counter() - start)
+                    keep_slot = stream
+                    return response
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                self._record(time.perf_counter() - start, error=True)
+                if attempt >= retries:
+                    raise
+            except requests.exceptions.RequestException:
+                self._record(time.perf_counter() - start, error=True)
+                raise
+            finally:
+                if not keep_slot:
+                    self._release()
+            self._sleep_before_retry(attempt)
+
+    def release_stream(self):
+        """Give back the concurrency slot held by a streamed response"""
+        self._release()
+
+    def generate(self, model, prompt, options=None):
+        """
+        Run a non-streaming /api/generate call
+
+        Returns:
+            dict: Ollama's JSON response
+        """
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        return self.request("POST", "/api/generate", json=payload).json()
+
+    def stream_generate(self, model, prompt, options=None):
+        """
+        Run a streaming /api/generate call
+
+        Yields:
+            dict: Each JSON line Ollama sends
+        """
+        payload = {"model": model, "prompt": prompt, "stream": True}
+        if options:
+            payload["options"] = options
+        response = self.request("POST", "/api/generate", json=payload, stream=True)
+        try:
+            for line in response.iter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                yield data
+                if data.get("done"):
+                    break
+        finally:
+            response.close()
+            self.release_stream()
+
+    def is_available(self):
+        """Return True if the server answers, without retrying"""
+        try:
+            self.request("GET", "/api/tags", max_retries=0)
+            return True
+        except requests.exceptions.RequestException:
+            return False
+
+    def metrics(self):
+        """
+        Report call counts and latency percentiles
+
+        Returns:
+            dict: calls, errors, retries, in_flight, queued and p50/p95/max latency
+                plus mean queue wait, all in milliseconds
+        """
+        with self._metrics_lock:
+            latencies = sorted(self._latencies)
+            waits = list(self._queue_waits)
+            metrics = {
+                "calls": self._calls,
+                "errors": self._errors,
+                "retries": self._retries,
+                "in_flight": self._in_flight,
+                "queued": self._queued,
+                "max_concurrency": self.max_concurrency,
+            }
+
+        def percentile(p):
+            if not latencies:
+                return 0.0
+            return latencies[min(int(p * len(latencies)), len(latencies) - 1)] * 1000
+
+        metrics.update({
+            "p50_ms": round(percentile(0.50), 1),
+            "p95_ms": round(percentile(0.95), 1),
+            "max_ms": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+            "mean_queue_wait_ms": round(statistics.mean(waits) * 1000, 1) if waits else 0.0,
+        })
+        return metrics
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_ollama_client(base_url=None):
+    """Return the process-wide OllamaClient for a server URL"""
+    base_url = (base_url or os.environ.get("OLLAMA_BASE_URL", DEFAULT_OLLAMA_URL)).rstrip("/")
+    with _clients_lock:
+        if base_url not in _clients:
+            _clients[base_url] = OllamaClient(base_url=base_url)
+        return _clients[base_url]
+
+
+class AsyncOllamaClient:
+    """
+    asyncio counterpart of OllamaClient for fanning out many generations
+
+    Use as an async context manager; it owns one aiohttp session. Every request
+    takes a slot from the process-wide OllamaClient for the same server, so
+    threads and fan-outs together never exceed OLLAMA_MAX_CONCURRENCY, and
+    its calls, errors, retries and latencies show up in that client's metrics().
+    max_workers further caps this fan-out alone.
+    """
+
+    def __init__(self, base_url=None, max_workers=None, read_timeout=None, max_retries=3, backoff_seconds=0.5):
+        self.shared = get_ollama_client(base_url)
+        self.base_url = self.shared.base_url
+        if max_workers is None:
+            max_workers = self.shared.max_concurrency
+        if read_timeout is None:
+            read_timeout = float(os.environ.get("OLLAMA_TIMEOUT", 120))
+        self.max_workers = min(max_workers, self.shared.max_concurrency)
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_seconds = backoff_seconds
+        self.latencies = []
+        self._session = None
+        self._semaphore = None
+
+    async def __aenter__(self):
+        import aiohttp
+
+        self._semaphore = asyncio.Semaphore(self.max_workers)
+        self._session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_workers, keepalive_timeout=60),
+            timeout=aiohttp.ClientTimeout(sock_connect=5, sock_read=self.read_timeout)
+        )
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._session.close()
+
+    async def generate(self, model, prompt, options=None):
+        """
+        Run a non-streaming /api/generate call, retrying transient failures
+
+        Returns:
+            dict: Ollama's JSON response
+        """
+        import aiohttp
+
+        payload = {"model": model, "prompt": prompt, "stream": False}
+        if options:
+            payload["options"] = options
+        for attempt in range(self.max_retries + 1):
+            async with self._semaphore:
+                await self.shared._acquire_async()
+                start = time.perf_counter()
+                try:
+                    async with self._session.post(f"{self.base_url}/api/generate", json=payload) as response:
+                        if response.status not in RETRY_STATUS_CODES or attempt >= self.max_retries:
+                            response.raise_for_status()
+                            data = await response.json(content_type=None)
+                            latency = time.perf_counter() - start
+                            self.shared._record(latency)
+                            self.latencies.append(latency)
+                            return data
+                    self.shared._record(time.perf_counter() - start, error=True)
+                except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+                    self.shared._record(time.perf_counter() - start, error=True)
+                    if attempt >= self.max_retries:
+                        raise
+                except aiohttp.ClientError:
+                    self.shared._record(time.perf_counter() - start, error=True)
+                    raise
+                finally:
+                    self.shared._release()
+            await asyncio.sleep(self.shared._retry_delay(attempt, self.backoff_seconds))
+
+
+async def generate_many(jobs, model, base_url=None, max_workers=None):
+    """
+    Generate completions for many prompts concurrently
+
+    Args:
+        jobs (list): (key, prompt) pairs
+        model (str): Ollama model to run
+        base_url (str): Ollama server URL
+        max_workers (int): Generations of this call allowed in flight at once (never more
+            than the shared client's max_concurrency)
+
+    Yields:
+        tuple: (key, response_text, error) in completion order; error is None on
+            success, otherwise the exception and response_text is None
+    """
+    async with AsyncOllamaClient(base_url=base_url, max_workers=max_workers) as client:
+
+        async def run(key, prompt):
+            try:
+                data = await client.generate(model, prompt)
+                return key, data.get("response", "").strip(), None
+            except Exception as e:
+                return key, None, e
+
+        tasks = [asyncio.ensure_future(run(key, prompt)) for key, prompt in jobs]
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
@@ -0,0 +1,237 @@
+# llm/response_cache.py
+"""
+Disk-backed cache for LLM responses
+
+Deterministic generations (greedy decoding) always produce the same text for
+the same model, prompt and settings, so their outputs are kept in SQLite and
+served from there on repeat calls.
+"""
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+DEFAULT_CACHE_PATH = "./llm_cache.sqlite3"
+DEFAULT_MAX_SIZE_MB = 256
+
+
+class ResponseCache:
+    def __init__(self, path=None, max_size_mb=None):
+        """
+        Open (or create) the cache database
+
+        Args:
+            path (str): SQLite file. Defaults to LLM_CACHE_PATH or ./llm_cache.sqlite3
+            max_size_mb (int): Size bound for stored responses; least-recently-used
+                entries are evicted beyond it. Defaults to LLM_CACHE_MAX_SIZE_MB or 256.
+        """
+        self.path = path or os.environ.get("LLM_CACHE_PATH", DEFAULT_CACHE_PATH)
+        if max_size_mb is None:
+            max_size_mb = int(os.environ.get("LLM_CACHE_MAX_SIZE_MB", DEFAULT_MAX_SIZE_MB))
+        self.max_size_bytes = int(max_size_mb) * 1024 * 1024
+
+        self.hits = 0
+        self.misses = 0
+        self.bypassed = 0
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                model TEXT,
+                response TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                created_at REAL NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses (last_access)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_id, prompt, generation_kwargs):
+        """
+        Hash the model id, the exact prompt and the generation settings
+
+        Returns:
+            str: Hex digest identifying the generation
+        """
+        payload = json.dumps(
+            {"model": model_id, "prompt": prompt, "kwargs": generation_kwargs},
+            sort_keys=True,
+            default=str
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        """
+        Look up a cached response
+
+        Returns:
+            The decoded response, or None on a miss
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return json.loads(row[0])
+
+    def put(self, key, response, model_id=None):
+        """
+        Store a response and evict old entries if the cache is over its size bound
+
+        Args:
+            key (str): Key from make_key()
+            response: JSON-serialisable pipeline output
+            model_id (str): Model that produced the response (informational)
+        """
+        encoded = json.dumps(response)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (key, model_id, encoded, len(encoded), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_size_bytes:
+            return
+        rows = self._conn.execute("SELECT key, size FROM responses ORDER BY last_access ASC").fetchall()
+        evicted = []
+        for key, size in rows:
+            if total <= self.max_size_bytes:
+                break
+            evicted.append((key,))
+            total -= size
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", evicted)
+
+    def clear(self):
+        """Remove every cached response"""
+        with self._lock:
+            self._conn.execute("DELETE FROM responses")
+            self._conn.commit()
+
+    def stats(self):
+        """
+        Report cache effectiveness
+
+        Returns:
+            dict: hits, misses, bypassed calls, hit rate, entry count and stored bytes
+        """
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypassed": self.bypassed,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "size_bytes": size,
+        }
+
+
+class CachedPipeline:
+    """
+    Drop-in wrapper around a text-generation pipeline that consults the cache
+
+    Sampled generations (do_sample=True) bypass the cache unless cache_sampled is
+    set, since their output is not meant to repeat. Any other attribute is
+    forwarded to the wrapped pipeline.
+    """
+
+    def __init__(self, hf_pipeline, model_id=None, cache=None, cache_sampled=False):
+        self.pipeline = hf_pipeline
+        if model_id is None:
+            model_id = getattr(getattr(hf_pipeline, "model", None), "name_or_path", None)
+        self.model_id = model_id
+        self.cache = cache if cache is not None else get_response_cache()
+        self.cache_sampled = cache_sampled
+
+    def __getattr__(self, name):
+        if name == "pipeline":
+            raise AttributeError(name)
+        return getattr(self.pipeline, name)
+
+    def is_cacheable(self, generation_kwargs):
+        """Return True if a call with these settings may be served from the cache"""
+        if self.cache is None:
+            return False
+        if self.cache_sampled:
+            return True
+        nested = generation_kwargs.get("generate_kwargs") or {}
+        return not (generation_kwargs.get("do_sample") or nested.get("do_sample"))
+
+    def _key(self, prompt, generation_kwargs):
+        return self.cache.make_key(self.model_id, prompt, generation_kwargs)
+
+    def get_text(self, prompt, **generation_kwargs):
+        """Return the cached 'generated_text' for a prompt, or None"""
+        if not self.is_cacheable(generation_kwargs):
+            return None
+        output = self.cache.get(self._key(prompt, generation_kwargs))
+        if output is None:
+            return None
+        return output[0].get("generated_text", "")
+
+    def put_text(self, prompt, text, **generation_kwargs):
+        """Store a 'generated_text' produced outside the pipeline call (e.g. streaming)"""
+        if self.is_cacheable(generation_kwargs):
+            self.cache.put(self._key(prompt, generation_kwargs), [{"generated_text": text}], self.model_id)
+
+    def __call__(self, text_inputs, **generation_kwargs):
+        if not self.is_cacheable(generation_kwargs):
+            if self.cache is not None:
+                self.cache.bypassed += 1
+            return self.pipeline(text_inputs, **generation_kwargs)
+
+        single = isinstance(text_inputs, str)
+        prompts = [text_inputs] if single else list(text_inputs)
+        keys = [self._key(prompt, generation_kwargs) for prompt in prompts]
+        outputs = [self.cache.get(key) for key in keys]
+
+        missing = [i for i, output in enumerate(outputs) if output is None]
+        if missing:
+            if single:
+                fresh = [self.pipeline(prompts[0], **generation_kwargs)]
+            else:
+                fresh = self.pipeline([prompts[i] for i in missing], **generation_kwargs)
+            for i, output in zip(missing, fresh):
+                self.cache.put(keys[i], output, self.model_id)
+                outputs[i] = output
+
+        return outputs[0] if single else outputs
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """
+    Return the process-wide ResponseCache
+
+    Returns None when caching is switched off with LLM_CACHE_DISABLED=1.
+    """
+    global _cache
+    if os.environ.get("LLM_CACHE_DISABLED") == "1":
+        return None
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache()
+        return _cache
@@ -0,0 +1,208 @@
+# llm/stopping.py
+"""
+Stopping criteria that end generation once the expected output is complete
+
+The agents ask for a JSON array or fenced code blocks, so anything generated
+after that structure is closed is noise. These criteria stop early and keep
+enough state to report how many tokens the stop saved.
+"""
+from collections import Counter
+
+import torch
+from transformers import StoppingCriteria, StoppingCriteriaList
+
+
+class _TrackedCriteria(StoppingCriteria):
+    """Base class that tracks the prompt length and per-row generated tokens"""
+
+    name = "stop"
+
+    def __init__(self):
+        self.prompt_length = None
+        self.generated_tokens = 0
+        self.triggered = False
+        self._rows = []
+
+    def __repr__(self):
+        # Stable representation so the criteria can be part of a cache key
+        return f"{self.__class__.__name__}({self._params()})"
+
+    def _params(self):
+        return ""
+
+    def _new_row_state(self):
+        return None
+
+    def _update_row(self, state, token_id):
+        """Feed one generated token to a row; return True if the row is complete"""
+        raise NotImplementedError
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.prompt_length is None:
+            # First call happens after the first generated token
+            self.prompt_length = input_ids.shape[-1] - 1
+            self._rows = [self._new_row_state() for _ in range(input_ids.shape[0])]
+        self.generated_tokens = input_ids.shape[-1] - self.prompt_length
+
+        done = []
+        for row, state in enumerate(self._rows):
+            done.append(self._update_row(state, int(input_ids[row, -1])))
+        if any(done):
+            self.triggered = True
+        return torch.tensor(done, dtype=torch.bool, device=input_ids.device)
+
+
+class JsonArrayClosedCriteria(_TrackedCriteria):
+    """Stop once the first top-level JSON array of objects has been closed"""
+
+    name = "json_array"
+
+    def __init__(self, tokenizer):
+        super().__init__()
+        self.tokenizer = tokenizer
+
+    def _new_row_state(self):
+        return {"depth": 0, "opened": False, "has_object": False, "in_string": False, "escape": False, "done": False}
+
+    def _update_row(self, state, token_id):
+        if state["done"]:
+            return True
+        for char in self.tokenizer.decode([token_id], skip_special_tokens=True):
+            if state["in_string"]:
+                if state["escape"]:
+                    state["escape"] = False
+                elif char == "\\":
+                    state["escape"] = True
+                elif char == '"':
+                    state["in_string"] = False
+            elif char == '"' and state["opened"]:
+                state["in_string"] = True
+            elif char == "[":
+                state["opened"] = True
+                state["depth"] += 1
+            elif char == "{" and state["opened"]:
+                state["has_object"] = True
+            elif char == "]" and state["opened"]:
+                state["depth"] -= 1
+                if state["depth"] == 0:
+                    if state["has_object"]:
+                        state["done"] = True
+                        return True
+                    # Brackets in prose such as "[High/Medium/Low]" are not the answer
+                    state["opened"] = False
+        return False
+
+
+class FencedBlocksClosedCriteria(_TrackedCriteria):
+    """Stop once N fenced (```) code blocks have been opened and closed"""
+
+    name = "fenced_blocks"
+
+    def __init__(self, tokenizer, n_blocks=1):
+        super().__init__()
+        self.tokenizer = tokenizer
+        self.n_blocks = n_blocks
+
+    def _params(self):
+        return f"n_blocks={self.n_blocks}"
+
+    def _new_row_state(self):
+        return {"token_ids": []}
+
+    def _update_row(self, state, token_id):
+        state["token_ids"].append(token_id)
+        # Decode the whole row so fences split across tokens are still seen
+        text = self.tokenizer.decode(state["token_ids"], skip_special_tokens=True)
+        return text.count("```") >= 2 * self.n_blocks
+
+
+class NgramRepetitionCriteria(_TrackedCriteria):
+    """Stop when the latest n-gram of generated tokens has repeated too often"""
+
+    name = "ngram_repetition"
+
+    def __init__(self, ngram_size=12, max_repeats=4):
+        super().__init__()
+        self.ngram_size = ngram_size
+        self.max_repeats = max_repeats
+
+    def _params(self):
+        return f"ngram_size={self.ngram_size}, max_repeats={self.max_repeats}"
+
+    def _new_row_state(self):
+        return {"token_ids": [], "counts": Counter()}
+
+    def _update_row(self, state, token_id):
+        token_ids = state["token_ids"]
+        token_ids.append(token_id)
+        if len(token_ids) < self.ngram_size:
+            return False
+        ngram = tuple(token_ids[-self.ngram_size:])
+        state["counts"][ngram] += 1
+        return state["counts"][ngram] >= self.max_repeats
+
+
+def build_stopping_criteria(tokenizer, structure=None, n_blocks=1, ngram_size=12, max_ngram_repeats=4):
+    """
+    Build the stopping criteria for one generation call
+
+    Args:
+        tokenizer: Tokenizer of the model being run (None disables structure checks)
+        structure (str): "json_array", "fenced_blocks" or None for repetition only
+        n_blocks (int): Number of fenced blocks to wait for with "fenced_blocks"
+        ngram_size (int): Token n-gram length used to detect loops
+        max_ngram_repeats (int): How often an n-gram may appear before stopping
+
+    Returns:
+        StoppingCriteriaList: Fresh criteria (they hold per-call state)
+    """
+    criteria = []
+    if tokenizer is None:
+        # Structure checks need to decode tokens; fall back to loop detection only
+        structure = None
+    if structure == "json_array":
+        criteria.append(JsonArrayClosedCriteria(tokenizer))
+    elif structure == "fenced_blocks":
+        criteria.append(FencedBlocksClosedCriteria(tokenizer, n_blocks=n_blocks))
+    elif structure is not None:
+        raise ValueError(f"Unknown output structure: {structure}")
+    criteria.append(NgramRepetitionCriteria(ngram_size=ngram_size, max_repeats=max_ngram_repeats))
+    return StoppingCriteriaList(criteria)
+
+
+def report_early_stop(stopping_criteria, max_new_tokens=None, max_length=None, label="generation"):
+    """
+    Report how many tokens an early stop saved
+
+    Args:
+        stopping_criteria (StoppingCriteriaList): Criteria used for the call
+        max_new_tokens (int): Token budget of the call, if set that way
+        max_length (int): Total length budget of the call (prompt + new tokens)
+        label (str): Name printed with the report
+
+    Returns:
+        dict: generated tokens, budget, tokens saved and which criterion fired,
+            or None if the criteria never ran (e.g. a cached response)
+    """
+    tracked = [c for c in stopping_criteria if isinstance(c, _TrackedCriteria)]
+    if not tracked or tracked[0].prompt_length is None:
+        return None
+
+    generated = tracked[0].generated_tokens
+    if max_new_tokens is not None:
+        budget = max_new_tokens
+    elif max_length is not None:
+        budget = max(max_length - tracked[0].prompt_length, 0)
+    else:
+        budget = generated
+
+    stopped_by = next((c.name for c in tracked if c.triggered), None)
+    report = {
+        "generated_tokens": generated,
+        "token_budget": budget,
+        "tokens_saved": max(budget - generated, 0) if stopped_by else 0,
+        "stopped_by": stopped_by,
+    }
+    if stopped_by:
+        print(f"✂️ {label}: early stop ({stopped_by}) saved {report['tokens_saved']} of {budget} tokens")
+    return report
@@ -0,0 +1,164 @@
+# llm/streaming.py
+"""
+Token streaming for Hugging Face text-generation pipelines
+"""
+import time
+from threading import Thread
+
+from transformers import TextIteratorStreamer
+
+from llm.response_cache import CachedPipeline
+
+
+class GenerationStats:
+    """Live progress of a streamed generation"""
+
+    def __init__(self, token_budget=None):
+        self.tokens = 0
+        self.token_budget = token_budget
+        self.started_at = time.perf_counter()
+        self.finished = False
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started_at
+
+    @property
+    def tokens_per_second(self):
+        elapsed = self.elapsed
+        return self.tokens / elapsed if elapsed > 0 else 0.0
+
+    @property
+    def progress(self):
+        """Fraction of the token budget used so far (1.0 once finished)"""
+        if self.finished:
+            return 1.0
+        if not self.token_budget:
+            return 0.0
+        return min(self.tokens / self.token_budget, 1.0)
+
+
+class _CountingStreamer(TextIteratorStreamer):
+    """TextIteratorStreamer that also counts the generated tokens"""
+
+    def __init__(self, tokenizer, stats, **kwargs):
+        super().__init__(tokenizer, **kwargs)
+        self.stats = stats
+
+    def put(self, value):
+        if not (self.skip_prompt and self.next_tokens_are_prompt):
+            self.stats.tokens += value.numel()
+        super().put(value)
+
+
+def stream_generate(hf_pipeline, prompt, **generation_kwargs):
+    """
+    Stream text from a text-generation pipeline as it is produced
+
+    Generation runs on a background thread; this generator yields each decoded
+    chunk together with the live GenerationStats. An exception raised by
+    generate() is re-raised here once the stream has been closed.
+
+    Args:
+        hf_pipeline: A transformers text-generation pipeline
+        prompt (str): Prompt to complete
+        **generation_kwargs: Arguments forwarded to model.generate()
+
+    Yields:
+        tuple: (text_chunk, GenerationStats)
+    """
+    tokenizer = hf_pipeline.tokenizer
+    model = hf_pipeline.model
+
+    inputs = tokenizer(prompt, return_tensors="pt").to(model.device)
+    prompt_tokens = inputs["input_ids"].shape[-1]
+
+    token_budget = generation_kwargs.get("max_new_tokens")
+    if token_budget is None and generation_kwargs.get("max_length"):
+        token_budget = max(generation_kwargs["max_length"] - prompt_tokens, 0)
+
+    stats = GenerationStats(token_budget=token_budget)
+    streamer = _CountingStreamer(tokenizer, stats, skip_prompt=True, skip_special_tokens=True)
+
+    errors = []
+
+    def run_generate():
+        # Without end() the streamer never stops iterating, so a failing
+        # generate() has to close it and hand the error to the caller
+        try:
+            model.generate(**inputs, streamer=streamer, **generation_kwargs)
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+
+    thread = Thread(target=run_generate, daemon=True)
+    thread.start()
+
+    for chunk in streamer:
+        yield chunk, stats
+
+    thread.join()
+    if errors:
+        raise errors[0]
+    stats.finished = True
+    yield "", stats
+
+
+def generate_streaming(hf_pipeline, prompt, stream_callback, **generation_kwargs):
+    """
+    Generate text while reporting every chunk to a callback
+
+    Backends with their own stream() method (Ollama, fake) are streamed through
+    it. Pipelines without a model/tokenizer (e.g. custom callables) are run
+    normally and their whole output is reported as a single chunk, as are
+    responses served from the LLM response cache.
+
+    Args:
+        hf_pipeline: A transformers text-generation pipeline or LLM backend
+        prompt (str): Prompt to complete
+        stream_callback (callable): Called as stream_callback(text_chunk, stats)
+        **generation_kwargs: Arguments forwarded to model.generate()
+
+    Returns:
+        str: The prompt followed by the generated text, like the pipeline's
+            default 'generated_text'
+    """
+    if isinstance(hf_pipeline, CachedPipeline):
+        cached = hf_pipeline.get_text(prompt, **generation_kwargs)
+        if cached is not None:
+            stats = GenerationStats()
+            stats.finished = True
+            stream_callback(cached[len(prompt):] if cached.startswith(prompt) else cached, stats)
+            return cached
+
+    if callable(getattr(type(hf_pipeline), "stream", None)):
+        # Remote/fake backends stream natively; count each chunk as a token
+        stats = GenerationStats(token_budget=generation_kwargs.get("max_new_tokens"))
+        chunks = []
+        for chunk in hf_pipeline.stream(prompt, **generation_kwargs):
+            chunks.append(chunk)
+            stats.tokens += 1
+            stream_callback(chunk, stats)
+        stats.finished = True
+        stream_callback("", stats)
+        return prompt + "".join(chunks)
+
+    if not (hasattr(hf_pipeline, "model") and hasattr(hf_pipeline, "tokenizer")):
+        stats = GenerationStats()
+        result = hf_pipeline(prompt, **generation_kwargs)
+        if isinstance(result, list) and result and isinstance(result[0], dict):
+            result = result[0].get("generated_text", str(result))
+        result = str(result)
+        stats.finished = True
+        stream_callback(result, stats)
+        return result
+
+    chunks = []
+    for chunk, stats in stream_generate(hf_pipeline, prompt, **generation_kwargs):
+        chunks.append(chunk)
+        stream_callback(chunk, stats)
+    result = prompt + "".join(chunks)
+
+    if isinstance(hf_pipeline, CachedPipeline):
+        hf_pipeline.put_text(prompt, result, **generation_kwargs)
+    return result